@@ -0,0 +1,289 @@
+"""
+ASGI serving mode for the Flask-RESTX app
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+POST /query awaits the model pool on the event loop, so slow Gemini calls
+do not hold a worker thread; only the short prepare and complete steps run
+in a thread, inside a normal Flask request context. Every other request
+runs the WSGI app in a bounded thread pool, with /analytics/ requests in a
+separate, smaller pool so CPU-heavy analytics cannot starve the rest.
+Lifespan events start and stop the background refresher, cache compactor
+and persistent response cache. With PROFILE_SLOW_THRESHOLD set, a slow
+/query is recorded as prepare, model_wait and complete phases.
+"""
+
+import asyncio
+import io
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import request
+
+import main
+from profiling import SPLIT_REQUEST_KEY
+from responses import output_json
+
+logger = logging.getLogger(__name__)
+
+ASGI_IO_THREADS = int(os.environ.get('ASGI_IO_THREADS', 32))
+ASGI_CPU_THREADS = int(os.environ.get('ASGI_CPU_THREADS', os.cpu_count() or 2))
+ASGI_MAX_BODY = int(os.environ.get('ASGI_MAX_BODY', 10 * 1024 * 1024))  # bytes
+CPU_PATH_PREFIXES = ('/analytics/',)
+ASYNC_QUERY_PATH = '/query'
+
+
+class RequestBodyTooLarge(Exception):
+    pass
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope with an already-buffered body"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin1').upper().replace('-', '_')
+        value = raw_value.decode('latin1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = name if name == 'CONTENT_TYPE' else f'HTTP_{name}'
+        if key in environ:
+            separator = '; ' if key == 'HTTP_COOKIE' else ','
+            environ[key] = f"{environ[key]}{separator}{value}"
+        else:
+            environ[key] = value
+    return environ
+
+
+def encode_headers(headers):
+    return [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers]
+
+
+class AsyncFlaskApp:
+    """ASGI application wrapping a Flask app with bounded executors"""
+
+    def __init__(self, flask_app, io_threads=ASGI_IO_THREADS, cpu_threads=ASGI_CPU_THREADS, max_body=ASGI_MAX_BODY):
+        self.flask_app = flask_app
+        self.max_body = max_body
+        self.io_threads = io_threads
+        self.cpu_threads = cpu_threads
+        self.io_executor = ThreadPoolExecutor(io_threads, thread_name_prefix='asgi-io')
+        self.cpu_executor = ThreadPoolExecutor(cpu_threads, thread_name_prefix='asgi-cpu')
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise RuntimeError(f"Unsupported ASGI scope type {scope['type']}")
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            try:
+                body = await self.read_body(receive)
+            except RequestBodyTooLarge:
+                return await self.send_response(send, 413, [('Content-Type', 'application/json')],
+                                                b'{"error": "Request body too large"}')
+            except ClientDisconnected:
+                return
+
+            environ = build_environ(scope, body)
+            if scope['method'] == 'POST' and scope['path'].rstrip('/') == ASYNC_QUERY_PATH:
+                await self.handle_query(environ, body, send)
+            else:
+                executor = self.cpu_executor if scope['path'].startswith(CPU_PATH_PREFIXES) else self.io_executor
+                await self.call_wsgi(environ, send, executor)
+        finally:
+            self.in_flight -= 1
+
+    async def read_body(self, receive):
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                raise ClientDisconnected()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > self.max_body:
+                raise RequestBodyTooLarge()
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    @staticmethod
+    async def send_response(send, status, headers, body):
+        await send({'type': 'http.response.start', 'status': status, 'headers': encode_headers(headers)})
+        await send({'type': 'http.response.body', 'body': body, 'more_body': False})
+
+    async def call_wsgi(self, environ, send, executor):
+        """Run the WSGI app on one executor thread and forward its chunks as they are produced.
+
+        The whole call stays on one thread because streamed responses keep the
+        Flask request context pushed while their generator runs. The chunk
+        queue is bounded so a slow client applies backpressure to the stream.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=8)
+
+        def put(item):
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        def run():
+            status_headers = []
+
+            def start_response(status, headers, exc_info=None):
+                status_headers[:] = [int(status.split(' ', 1)[0]), headers]
+                return lambda data: put(('body', data))
+
+            try:
+                iterable = self.flask_app(environ, start_response)
+                try:
+                    started = False
+                    for chunk in iterable:
+                        if not started:
+                            put(('start', status_headers))
+                            started = True
+                        if chunk:
+                            put(('body', chunk))
+                    if not started:
+                        put(('start', status_headers))
+                finally:
+                    if hasattr(iterable, 'close'):
+                        iterable.close()
+                put(('end', None))
+            except BaseException as e:
+                put(('error', e))
+
+        future = loop.run_in_executor(executor, run)
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind == 'start':
+                    status, headers = value
+                    await send({'type': 'http.response.start', 'status': status, 'headers': encode_headers(headers)})
+                elif kind == 'body':
+                    await send({'type': 'http.response.body', 'body': value, 'more_body': True})
+                elif kind == 'end':
+                    await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+                    break
+                else:
+                    raise value
+        finally:
+            # Keep draining so the worker thread never blocks on a queue nobody reads
+            while not future.done():
+                try:
+                    await asyncio.wait_for(queue.get(), timeout=0.1)
+                except asyncio.TimeoutError:
+                    pass
+            await future
+
+    def run_in_request_context(self, environ, body, work):
+        """Run work() in a Flask request context with the app's request hooks.
+
+        work returns (result, pending). A (body, status) result is finished
+        like a normal Flask response and returned as (status, headers, bytes);
+        a pending request returns (None, pending) and is finished later.
+        """
+        environ = dict(environ, **{'wsgi.input': io.BytesIO(body)})
+        app = self.flask_app
+        with app.request_context(environ):
+            try:
+                response = app.preprocess_request()
+                if response is None:
+                    result, pending = work()
+                    if pending is not None:
+                        return None, pending
+                    response = output_json(*result)
+                response = app.process_response(app.make_response(response))
+            except Exception as e:
+                response = app.make_response(app.handle_exception(e))
+            return (response.status_code, response.headers.to_wsgi_list(), response.get_data()), None
+
+    async def handle_query(self, environ, body, send):
+        """POST /query with the model call awaited on the event loop"""
+        loop = asyncio.get_running_loop()
+        environ = dict(environ, **{SPLIT_REQUEST_KEY: True})
+        phases = []
+        started = time.perf_counter()
+        prepare = lambda: main.prepare_ai_query(request.get_json(silent=True))
+        response, pending = await loop.run_in_executor(self.io_executor, self.run_in_request_context,
+                                                       environ, body, prepare)
+        phases.append(('prepare', time.perf_counter() - started))
+        if pending is not None:
+            ai_response, error = None, None
+            started = time.perf_counter()
+            try:
+                ai_response = await main.make_ai_request_async(pending['prompt'], pending['user_query'])
+            except Exception as e:
+                error = e
+            phases.append(('model_wait', time.perf_counter() - started))
+            started = time.perf_counter()
+            complete = lambda: (main.complete_ai_query(pending, ai_response, error), None)
+            response, _ = await loop.run_in_executor(self.io_executor, self.run_in_request_context,
+                                                     environ, body, complete)
+            phases.append(('complete', time.perf_counter() - started))
+        await self.send_response(send, *response)
+
+        profiler = main.request_profiler
+        if profiler is not None and profiler.is_slow(sum(seconds for _, seconds in phases)):
+            await loop.run_in_executor(self.io_executor, profiler.record_phases, 'POST', ASYNC_QUERY_PATH, phases)
+
+    async def lifespan(self, receive, send):
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await loop.run_in_executor(self.io_executor, main.start_background_tasks)
+                except Exception as e:
+                    logger.error(f"Startup failed: {e}")
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                logger.info(f"ASGI app started ({self.io_threads} I/O threads, {self.cpu_threads} analytics threads)")
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await loop.run_in_executor(None, self.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def shutdown(self):
+        self.io_executor.shutdown(wait=True)
+        self.cpu_executor.shutdown(wait=True)
+        main.stop_background_tasks()
+
+
+app = AsyncFlaskApp(main.app)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host=os.environ.get('HOST', '0.0.0.0'), port=int(os.environ.get('PORT', 5000)), lifespan='on')
@@ -0,0 +1,267 @@
+"""
+Offline transaction categorization for imported transactions without a category
+
+Run `python categorizer.py train` to fit the model on the labeled ledger and
+save the artifact that workers load on first use. The artifact records a hash
+of the labels it was fit on and is retrained when the ledger's labels change.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+from collections import OrderedDict
+
+from search_index import merchant_key
+
+# The model is optional; without scikit-learn uncategorized imports stay 'other'
+try:
+    import numpy as np
+    import joblib
+    from sklearn.compose import ColumnTransformer
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import FunctionTransformer, OneHotEncoder
+except ImportError:
+    make_pipeline = None
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_CATEGORY = 'other'
+
+# Seed examples so common categories are known before the ledger has labels for them
+SEED_TRANSACTIONS = [
+    ("Grocery Store", -60.0, 'food'), ("Supermarket", -95.0, 'food'), ("Restaurant", -40.0, 'food'),
+    ("Coffee Shop", -6.5, 'food'), ("Pizza Delivery", -25.0, 'food'), ("Cafe", -12.0, 'food'),
+    ("Gas Station", -45.0, 'transportation'), ("Fuel", -50.0, 'transportation'),
+    ("Uber Trip", -18.0, 'transportation'), ("Parking", -10.0, 'transportation'),
+    ("Metro Card", -30.0, 'transportation'), ("Taxi", -22.0, 'transportation'),
+    ("Electric Bill", -110.0, 'utilities'), ("Water Bill", -40.0, 'utilities'),
+    ("Internet Service", -60.0, 'utilities'), ("Phone Bill", -55.0, 'utilities'),
+    ("Netflix Subscription", -15.0, 'entertainment'), ("Movie Tickets", -30.0, 'entertainment'),
+    ("Spotify", -10.0, 'entertainment'), ("Concert", -80.0, 'entertainment'),
+    ("Salary Deposit", 3500.0, 'income'), ("Payroll", 3200.0, 'income'),
+    ("Freelance Payment Received", 800.0, 'income'), ("Interest Earned", 12.0, 'income'),
+    ("Credit Card Payment", -200.0, 'debt_payment'), ("Loan Payment", -350.0, 'debt_payment'),
+    ("Mortgage Payment", -1500.0, 'debt_payment'),
+    ("Investment Contribution", -500.0, 'investment'), ("Brokerage Transfer", -1000.0, 'investment'),
+    ("Mutual Fund SIP", -250.0, 'investment'),
+]
+
+
+def amount_features(amounts):
+    """Sign and log-magnitude of each amount as dense features"""
+    values = np.asarray(amounts, dtype=float).reshape(-1)
+    return np.column_stack([values > 0, np.log1p(np.abs(values))]).astype(float)
+
+
+def transaction_amount(txn):
+    """Amount as a finite float (missing counts as 0); ValueError for anything else"""
+    value = txn.get('amount')
+    if value is None or value == '':
+        return 0.0
+    try:
+        amount = float(value) if not isinstance(value, bool) else math.nan
+    except (TypeError, ValueError):
+        amount = math.nan
+    if not math.isfinite(amount):
+        raise ValueError(f"Transaction amount must be a finite number, got {value!r}")
+    return amount
+
+
+def feature_rows(transactions):
+    """(description, account, amount) rows in the layout the pipeline expects"""
+    rows = np.empty((len(transactions), 3), dtype=object)
+    for i, txn in enumerate(transactions):
+        rows[i, 0] = str(txn.get('description') or '')
+        rows[i, 1] = str(txn.get('account') or 'unknown')
+        rows[i, 2] = transaction_amount(txn)
+    return rows
+
+
+def memo_key(txn):
+    return (merchant_key(str(txn.get('description') or '')), 'credit' if transaction_amount(txn) > 0 else 'debit')
+
+
+def labeled_transactions(transactions):
+    """Ledger rows with an assigned category; rows the model categorized itself are not labels"""
+    return [t for t in transactions
+            if t.get('category') and t.get('category') != FALLBACK_CATEGORY and 'category_confidence' not in t]
+
+
+def label_version(transactions):
+    """Hash of the training rows, saved with the artifact to detect a stale model"""
+    rows = [(str(t.get('description') or ''), str(t.get('account') or 'unknown'), t.get('amount'), t['category'])
+            for t in labeled_transactions(transactions)]
+    return hashlib.md5(json.dumps(rows, default=str).encode()).hexdigest()[:12]
+
+
+class TransactionCategorizer:
+    """TF-IDF over descriptions plus account and amount features into logistic regression.
+
+    categorize() fills in categories for a batch in place: repeat merchants
+    are served from an LRU memo keyed by normalized merchant name and sign,
+    and the rest are classified with one predict_proba call per chunk.
+    Predictions below min_confidence fall back to 'other'.
+    """
+
+    def __init__(self, model=None, min_confidence=0.5, batch_size=5000, memo_size=10000, label_version=None):
+        self.model = model
+        self.label_version = label_version
+        self.min_confidence = min_confidence
+        self.batch_size = batch_size
+        self.memo_size = memo_size
+        self.memo = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.categorized = 0
+        self.memo_hits = 0
+        self.low_confidence = 0
+
+    @staticmethod
+    def build_pipeline():
+        features = ColumnTransformer([
+            ('description', TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4), sublinear_tf=True), 0),
+            ('account', OneHotEncoder(handle_unknown='ignore'), [1]),
+            ('amount', FunctionTransformer(amount_features), [2]),
+        ])
+        return make_pipeline(features, LogisticRegression(max_iter=1000, C=10))
+
+    @classmethod
+    def train(cls, transactions, **kwargs):
+        """Fit on labeled transactions plus the seed examples"""
+        labeled = labeled_transactions(transactions)
+        labeled += [{"description": d, "amount": a, "category": c} for d, a, c in SEED_TRANSACTIONS]
+        model = cls.build_pipeline()
+        model.fit(feature_rows(labeled), [t['category'] for t in labeled])
+        logger.info(f"Trained transaction categorizer on {len(labeled)} examples")
+        kwargs.setdefault('label_version', label_version(transactions))
+        return cls(model, **kwargs)
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        joblib.dump({"model": self.model, "label_version": self.label_version}, path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        artifact = joblib.load(path)
+        # Artifacts saved before label versions were recorded hold just the pipeline
+        if not isinstance(artifact, dict):
+            artifact = {"model": artifact, "label_version": None}
+        kwargs.setdefault('label_version', artifact['label_version'])
+        return cls(artifact['model'], **kwargs)
+
+    @classmethod
+    def load_or_train(cls, path, transactions, **kwargs):
+        """Load the saved artifact if it was fit on the ledger's current labels, else train and save.
+
+        Returns None without scikit-learn.
+        """
+        if make_pipeline is None:
+            logger.warning("scikit-learn not installed; imported transactions will not be auto-categorized")
+            return None
+        kwargs.setdefault('label_version', label_version(transactions))
+        if path and os.path.exists(path):
+            try:
+                categorizer = cls.load(path, **{k: v for k, v in kwargs.items() if k != 'label_version'})
+                if categorizer.label_version == kwargs['label_version']:
+                    logger.info(f"Loaded transaction categorizer from {path}")
+                    return categorizer
+                logger.info(f"Categorizer artifact {path} was trained on different labels, retraining")
+            except Exception as e:
+                logger.error(f"Could not load categorizer artifact {path}, retraining: {e}")
+        categorizer = cls.train(transactions, **kwargs)
+        if path:
+            categorizer.save(path)
+        return categorizer
+
+    def _remember(self, key, prediction):
+        self.memo[key] = prediction
+        self.memo.move_to_end(key)
+        while len(self.memo) > self.memo_size:
+            self.memo.popitem(last=False)
+
+    def predict(self, transactions):
+        """(category, confidence, source) per transaction, without modifying them.
+
+        Raises ValueError before any prediction when an amount is not a finite number.
+        """
+        keys = [memo_key(txn) for txn in transactions]
+        predictions = [None] * len(transactions)
+        pending = {}
+        with self.lock:
+            for i, key in enumerate(keys):
+                if key[0] and key in self.memo:
+                    self.memo.move_to_end(key)
+                    predictions[i] = self.memo[key] + ('memo',)
+                    self.memo_hits += 1
+                else:
+                    # Descriptions without a merchant name are classified individually
+                    pending.setdefault(key if key[0] else ('', i), []).append(i)
+
+        # One model row per distinct merchant in the batch
+        keys = list(pending)
+        for offset in range(0, len(keys), self.batch_size):
+            chunk = keys[offset:offset + self.batch_size]
+            rows = feature_rows([transactions[pending[key][0]] for key in chunk])
+            probabilities = self.model.predict_proba(rows)
+            best = probabilities.argmax(axis=1)
+            with self.lock:
+                for key, index, probability in zip(chunk, best, probabilities[np.arange(len(chunk)), best]):
+                    prediction = (str(self.model.classes_[index]), float(probability))
+                    if key[0]:
+                        self._remember(key, prediction)
+                    for i in pending[key]:
+                        predictions[i] = prediction + ('model',)
+        return predictions
+
+    def categorize(self, transactions):
+        """Assign category and category_confidence in place; returns the transactions"""
+        predictions = self.predict(transactions)
+        low_confidence = 0
+        for txn, (category, confidence, source) in zip(transactions, predictions):
+            if confidence < self.min_confidence:
+                category = FALLBACK_CATEGORY
+                low_confidence += 1
+            txn['category'] = category
+            txn['category_confidence'] = round(confidence, 3)
+        with self.lock:
+            self.categorized += len(transactions)
+            self.low_confidence += low_confidence
+        return transactions
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "categorized": self.categorized,
+                "memo_hits": self.memo_hits,
+                "memo_size": len(self.memo),
+                "low_confidence": self.low_confidence,
+                "min_confidence": self.min_confidence,
+                "categories": [str(c) for c in self.model.classes_]
+            }
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Transaction categorizer tools")
+    parser.add_argument('command', choices=['train'], help="train: fit on the labeled ledger and save the artifact")
+    parser.add_argument('--data', default=os.path.join(os.path.dirname(__file__), 'data', 'transactions.json'))
+    parser.add_argument('--out', default=os.path.join(os.path.dirname(__file__), 'cache', 'categorizer.joblib'))
+    args = parser.parse_args()
+
+    # Train through the imported module so the saved pipeline references
+    # categorizer.amount_features rather than __main__.amount_features,
+    # which the server could not unpickle
+    from categorizer import TransactionCategorizer as ImportedCategorizer
+
+    with open(args.data) as f:
+        ledger = json.load(f).get('transactions', [])
+    ImportedCategorizer.train(ledger).save(args.out)
+    logger.info(f"Saved categorizer to {args.out}")
@@ -0,0 +1,143 @@
+"""
+Debt payoff simulation over liabilities.json (avalanche, snowball and custom orders)
+"""
+
+import numpy as np
+
+STRATEGIES = ('avalanche', 'snowball', 'custom')
+
+# Balances below half a cent count as paid off
+PAID_EPSILON = 0.005
+
+
+def extract_debts(liabilities):
+    """Flatten every liability group into rows with balance, rate and minimum payment"""
+    debts = []
+    for kind, items in liabilities.items():
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            balance = float(item.get('balance', 0) or 0)
+            if balance <= 0:
+                continue
+            debts.append({
+                "id": item.get('id'),
+                "name": item.get('name') or item.get('address') or item.get('id'),
+                "kind": kind,
+                "balance": balance,
+                "interest_rate": float(item.get('interest_rate', 0) or 0),
+                "minimum_payment": float(item.get('minimum_payment', item.get('monthly_payment', 0)) or 0),
+                "credit_limit": item.get('credit_limit')
+            })
+    return debts
+
+
+def payoff_order(debts, strategy='avalanche', custom_order=None):
+    """Indices of debts in the order extra payments should be applied"""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"strategy must be one of {', '.join(STRATEGIES)}")
+
+    avalanche = sorted(range(len(debts)), key=lambda i: (-debts[i]['interest_rate'], debts[i]['balance']))
+    if strategy == 'avalanche':
+        return avalanche
+    if strategy == 'snowball':
+        return sorted(range(len(debts)), key=lambda i: (debts[i]['balance'], -debts[i]['interest_rate']))
+
+    if not custom_order:
+        raise ValueError("custom strategy requires an order of liability ids")
+    position = {debt_id: n for n, debt_id in enumerate(custom_order)}
+    avalanche_rank = {i: n for n, i in enumerate(avalanche)}
+    # Debts missing from the custom order fall back to avalanche order after the listed ones
+    return sorted(range(len(debts)), key=lambda i: (position.get(debts[i]['id'], len(position)), avalanche_rank[i]))
+
+
+def simulate_payoff(debts, extra_budgets, strategy='avalanche', custom_order=None,
+                    max_months=600, include_schedule=False):
+    """Simulate payoff for every extra-payment budget at once.
+
+    State is a (budgets x debts) balance matrix. Each month accrues interest,
+    pays every minimum, then pours the remaining budget (the extra payment
+    plus minimums freed by debts already paid off) down the priority order
+    with a cumulative-sum waterfall, so one step covers all budgets and
+    liabilities in a handful of array operations. The loop ends as soon as
+    every scenario is debt-free.
+    """
+    if not debts:
+        return {"strategy": strategy, "debts": [], "scenarios": []}
+
+    order = np.array(payoff_order(debts, strategy, custom_order), dtype=np.intp)
+    budgets = np.array(sorted(set(float(b) for b in extra_budgets) | {0.0}), dtype=float)
+    if not np.isfinite(budgets).all() or (budgets < 0).any():
+        raise ValueError("extra payment budgets must be finite, non-negative amounts")
+
+    n_budgets, n_debts = len(budgets), len(debts)
+    start = np.array([d['balance'] for d in debts], dtype=float)[order]
+    rates = np.array([d['interest_rate'] for d in debts], dtype=float)[order] / 100 / 12
+    minimums = np.array([d['minimum_payment'] for d in debts], dtype=float)[order]
+
+    balance = np.tile(start, (n_budgets, 1))
+    monthly_budget = minimums.sum() + budgets
+    total_interest = np.zeros(n_budgets)
+    total_paid = np.zeros(n_budgets)
+    payoff_month = np.full((n_budgets, n_debts), -1, dtype=int)
+    schedule = [] if include_schedule else None
+
+    month = 0
+    while month < max_months and (balance > PAID_EPSILON).any():
+        month += 1
+        interest = balance * rates
+        balance += interest
+        total_interest += interest.sum(axis=1)
+
+        minimum_paid = np.minimum(minimums, balance)
+        balance -= minimum_paid
+        available = np.maximum(monthly_budget - minimum_paid.sum(axis=1), 0)
+
+        owed_before = np.cumsum(balance, axis=1) - balance
+        extra_paid = np.clip(available[:, None] - owed_before, 0, balance)
+        balance -= extra_paid
+        total_paid += minimum_paid.sum(axis=1) + extra_paid.sum(axis=1)
+
+        newly_paid = (balance <= PAID_EPSILON) & (payoff_month < 0)
+        payoff_month[newly_paid] = month
+        balance[balance <= PAID_EPSILON] = 0.0
+
+        if include_schedule:
+            schedule.append(balance.copy())
+
+    baseline = 0  # budgets[0] is always the zero-extra baseline
+    scenarios = []
+    for b in range(n_budgets):
+        paid_off = bool((payoff_month[b] > 0).all())
+        scenario = {
+            "extra_payment": round(float(budgets[b]), 2),
+            "monthly_payment": round(float(monthly_budget[b]), 2),
+            "months_to_payoff": int(payoff_month[b].max()) if paid_off else None,
+            "total_interest": round(float(total_interest[b]), 2),
+            "interest_saved": round(float(total_interest[baseline] - total_interest[b]), 2),
+            "total_paid": round(float(total_paid[b]), 2),
+            "remaining_balance": round(float(balance[b].sum()), 2),
+            "payoff_months": {
+                debts[order[j]]['id']: (int(payoff_month[b, j]) if payoff_month[b, j] > 0 else None)
+                for j in range(n_debts)
+            }
+        }
+        if include_schedule:
+            months = scenario["months_to_payoff"] or len(schedule)
+            scenario["schedule"] = [
+                {
+                    "month": m + 1,
+                    "total_balance": round(float(row[b].sum()), 2),
+                    "balances": {debts[order[j]]['id']: round(float(row[b, j]), 2) for j in range(n_debts)}
+                }
+                for m, row in enumerate(schedule[:months])
+            ]
+        scenarios.append(scenario)
+
+    return {
+        "strategy": strategy,
+        "payoff_order": [debts[i]['id'] for i in order],
+        "debts": [debts[i] for i in order],
+        "minimum_monthly_payment": round(float(minimums.sum()), 2),
+        "scenarios": scenarios
+    }
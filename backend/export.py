@@ -0,0 +1,122 @@
+"""
+Streaming bulk export of transactions as CSV chunks or Arrow IPC record batches
+"""
+
+import csv
+import io
+from datetime import datetime
+
+# Arrow export is only offered when pyarrow is installed
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+EXPORT_COLUMNS = ('id', 'date', 'description', 'amount', 'category', 'account', 'type')
+EXPORT_FORMATS = ('csv', 'arrow')
+MIMETYPES = {
+    'csv': 'text/csv',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+
+def resolve_columns(columns):
+    """Validate a column projection, defaulting to every exported column"""
+    if not columns:
+        return list(EXPORT_COLUMNS)
+    unknown = [c for c in columns if c not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}. Available: {', '.join(EXPORT_COLUMNS)}")
+    return list(columns)
+
+
+def chunked(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_csv(transactions, columns, chunk_size=5000):
+    """Yield the header and then one encoded CSV block per chunk of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for chunk in chunked(transactions, chunk_size):
+        for txn in chunk:
+            writer.writerow([txn.get(c, '') for c in columns])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object whose contents are drained after each batch"""
+
+    def __init__(self):
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def arrow_schema(columns):
+    types = {'amount': pa.float64(), 'date': pa.date32()}
+    return pa.schema([(c, types.get(c, pa.string())) for c in columns])
+
+
+def _arrow_value(column, value):
+    if column == 'date':
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return None
+    if column == 'amount':
+        return float(value) if value is not None else None
+    return None if value is None else str(value)
+
+
+def iter_arrow(transactions, columns, chunk_size=5000):
+    """Yield an Arrow IPC stream, one record batch per chunk of rows"""
+    if pa is None:
+        raise RuntimeError("Arrow export requires pyarrow to be installed")
+
+    schema = arrow_schema(columns)
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(pa.PythonFile(sink, mode='w'), schema)
+    yield sink.drain()
+
+    for chunk in chunked(transactions, chunk_size):
+        arrays = [
+            pa.array([_arrow_value(c, txn.get(c)) for txn in chunk], type=schema.field(c).type)
+            for c in columns
+        ]
+        writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+
+def export_stream(transactions, fmt='csv', columns=None, chunk_size=5000):
+    """Generator over the encoded export of already-filtered transactions"""
+    if fmt == 'csv':
+        return iter_csv(transactions, columns, chunk_size)
+    if fmt == 'arrow':
+        return iter_arrow(transactions, columns, chunk_size)
+    raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
@@ -0,0 +1,370 @@
+"""
+Offline intent classification and slot extraction for numeric finance questions
+"""
+
+import re
+import threading
+
+# The classifier is optional; without scikit-learn only the rules are used
+try:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+except ImportError:
+    make_pipeline = None
+
+FALLTHROUGH = 'other'
+
+# Seed utterances for the classifier; 'other' covers questions that need the LLM
+TRAINING_UTTERANCES = {
+    'net_worth': [
+        "what is my net worth", "how much am i worth", "what's my net worth right now",
+        "net worth", "show my net worth", "tell me my total net worth",
+    ],
+    'total_assets': [
+        "what are my total assets", "how much do i own", "total value of my assets",
+        "sum of all my assets", "what are my assets worth",
+    ],
+    'total_liabilities': [
+        "how much debt do i have", "what are my total liabilities", "how much do i owe",
+        "total debt", "what is my total debt balance",
+    ],
+    'spending': [
+        "how much did i spend", "how much did i spend on food last month", "what did i spend on groceries",
+        "total spending this year", "how much have i spent on transportation", "my expenses last week",
+        "how much money went to utilities", "spending on restaurants last quarter", "what are my expenses",
+    ],
+    'merchant_spending': [
+        "how much at gas station", "how much did i spend at the grocery store", "how much have i spent at amazon",
+        "what did i pay at starbucks last month", "how much money went to walmart this year",
+        "total at the restaurant last week",
+    ],
+    'income': [
+        "how much did i earn", "what is my income", "how much income did i get last month",
+        "total income received", "how much money came in this year",
+    ],
+    'credit_score': [
+        "what is my credit score", "what's my credit score", "credit score", "show my cibil score",
+        "how good is my credit rating",
+    ],
+    FALLTHROUGH: [
+        "how can i save more money", "should i pay off my loan early", "give me a budget plan",
+        "can i afford a vacation next month", "why did my expenses increase", "what should i invest in",
+        "help me improve my credit score", "explain compound interest", "tips to reduce spending",
+        "compare my investments to the market", "is my portfolio diversified", "hello",
+        "what percentage of my income goes to food", "what is my income vs expenses ratio",
+        "what would my net worth be if i sold my car", "how is my credit score calculated",
+        "how much do i owe on my mortgage", "net worth of elon musk",
+    ],
+}
+
+# High-precision patterns checked before the classifier
+RULES = [
+    ('net_worth', re.compile(r"\bnet\s*worth\b", re.IGNORECASE)),
+    ('credit_score', re.compile(r"\b(credit|cibil)\s*(score|rating)\b", re.IGNORECASE)),
+    ('total_liabilities', re.compile(r"\b(how much (debt|do i owe)|total (debt|liabilities))\b", re.IGNORECASE)),
+    ('total_assets', re.compile(r"\btotal assets\b", re.IGNORECASE)),
+    ('merchant_spending', re.compile(r"\b(how much|what did i (spend|pay)|total)\b.*\bat\s+\w", re.IGNORECASE)),
+    ('spending', re.compile(r"\bhow much (did|have) i spen[dt]\b|\b(spent|spending|expenses)\b", re.IGNORECASE)),
+    ('income', re.compile(r"\bhow much (did i (earn|make)|income)\b|\b(income|earned|salary)\b", re.IGNORECASE)),
+]
+
+# Questions asking for advice or reasoning always go to the LLM
+ADVICE_PATTERN = re.compile(
+    r"\b(should|advice|advise|improve|plan|tips?|suggest|recommend|why|how (can|do|to)|can i afford|"
+    r"better|reduce|increase|compare|explain|what if|help)\b",
+    re.IGNORECASE
+)
+
+# Ratios, shares, hypotheticals and "how is X worked out" are not single stored figures
+DERIVED_PATTERN = re.compile(
+    r"\b(ratio|percent|percentage|proportion|share of|fraction|vs|versus|relative|average|per|"
+    r"if|would|could|will|going to|how (is|are|was|were|does|did)|calculated|computed|affect|impact)\b|%",
+    re.IGNORECASE
+)
+
+# Local answers are about the user's own figures: "what is my X", "how much did I ...",
+# or a bare "net worth" / "total spending last month"
+FIRST_PERSON_PATTERN = re.compile(r"\b(my|i|i'm|i've|me|mine)\b", re.IGNORECASE)
+BARE_LOOKUP_PATTERN = re.compile(
+    r"^\s*(show\s+)?(total\s+)?(net\s*worth|(credit|cibil)\s*(score|rating)|debt|liabilities|assets|"
+    r"spending|expenses|income)(\s+(this|last|past)\s+(week|month|quarter|year))?\s*[?.!]?\s*$",
+    re.IGNORECASE
+)
+OTHER_PERSON_PATTERN = re.compile(
+    r"\b(my\s+(wife|husband|spouse|partner|friend|son|daughter|brother|sister|mother|father|mom|dad|"
+    r"parents?|kids?|children|boss|colleague|neighbou?r)|someone|somebody|people|others|everyone)\b",
+    re.IGNORECASE
+)
+
+# Parts of a question an intent's aggregate cannot answer: a single named debt or
+# asset, income inside a spending question, or one source of income; these go to the LLM
+UNRESOLVED_PATTERNS = {
+    'total_liabilities': re.compile(
+        r"\b(mortgage|loans?|cards?|line of credit|heloc|emi|owe\s+(on|to|for)|debt\s+(on|to|for))\b",
+        re.IGNORECASE
+    ),
+    'total_assets': re.compile(r"\b(house|home|car|property|stocks?|shares|savings|account|in\s+(my|the))\b",
+                               re.IGNORECASE),
+    'spending': re.compile(r"\b(income|salary|earn(ed|ings)?)\b", re.IGNORECASE),
+    'income': re.compile(
+        r"\b(salary|salaries|pay\s*checks?|pay\s*slips?|wages?|freelanc\w*|bonus(es)?|dividends?|interest|"
+        r"rent(al)?|side|consulting|pension|refunds?|from)\b",
+        re.IGNORECASE
+    ),
+}
+
+TIMEFRAME_PATTERNS = [
+    ('last_week', re.compile(r"\b(last|this|past) week\b|\bpast 7 days\b", re.IGNORECASE)),
+    ('last_month', re.compile(r"\b(last|this|past) month\b|\bpast 30 days\b", re.IGNORECASE)),
+    ('last_quarter', re.compile(r"\b(last|this|past) quarter\b|\b(last|past) (3|three) months\b|\bpast 90 days\b", re.IGNORECASE)),
+    ('last_year', re.compile(r"\b(last|this|past) year\b|\b(last|past) (12|twelve) months\b", re.IGNORECASE)),
+]
+
+# Only these intents are answered for a timeframe; the others report current figures
+TIMEFRAME_INTENTS = ('spending', 'merchant_spending', 'income')
+
+# Date wording the timeframe slot cannot represent (calendar years and months, single
+# days, open ranges, other period lengths); answering anyway would give an all-time total
+DATE_PATTERN = re.compile(
+    r"\b((19|20)\d{2}|january|february|march|april|june|july|august|september|october|november|december|"
+    r"jan|feb|mar|apr|jun|jul|aug|sept?|oct|nov|dec|(in|of|during|since)\s+may|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|yesterday|today|tonight|tomorrow|"
+    r"days?|weeks?|weekends?|months?|quarters?|years?|q[1-4]|ytd|since|until|till|before|after|between|"
+    r"ago|recent|recently|lately)\b|\b\d{1,2}[/-]\d{1,2}([/-]\d{2,4})?\b",
+    re.IGNORECASE
+)
+
+# Merchant named after "at", up to a timeframe phrase or the end of the question
+MERCHANT_PATTERN = re.compile(
+    r"\bat\s+(?:the\s+)?(.+?)(?=\s+(?:in|during|over|for|this|last|past|since)\b|\s*[?.!]|\s*$)",
+    re.IGNORECASE
+)
+# "at Starbucks and Walmart", "at Target, Costco": more than one merchant
+MERCHANT_LIST_PATTERN = re.compile(r"\s(and|or|&)\s|[,/]", re.IGNORECASE)
+
+CATEGORY_SYNONYMS = {
+    'food': ['food', 'groceries', 'grocery', 'restaurant', 'restaurants', 'dining', 'eating out', 'meals'],
+    'transportation': ['transportation', 'transport', 'gas', 'fuel', 'petrol', 'commute', 'uber', 'taxi'],
+    'utilities': ['utilities', 'utility', 'bills', 'electricity', 'water bill', 'internet'],
+    'entertainment': ['entertainment', 'movies', 'streaming', 'games'],
+    'debt_payment': ['debt payment', 'debt payments', 'credit card payment', 'loan payment'],
+    'investment': ['investment', 'investments', 'investing'],
+}
+
+
+class IntentMatch:
+    def __init__(self, intent, confidence, source, slots=None):
+        self.intent = intent
+        self.confidence = confidence
+        self.source = source
+        self.slots = slots or {}
+
+    def to_dict(self):
+        return {"intent": self.intent, "confidence": round(self.confidence, 3), "source": self.source, "slots": self.slots}
+
+
+class IntentRouter:
+    """Rules plus a small TF-IDF/logistic-regression model over seed utterances.
+
+    route() returns an IntentMatch for questions that can be answered exactly
+    from local data, or None when the query should fall through to the LLM.
+    Hit-rate counters are kept so the share of locally answered queries can
+    be monitored.
+    """
+
+    def __init__(self, categories=(), threshold=0.55):
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.set_categories(categories)
+        self.classifier = self._train() if make_pipeline is not None else None
+
+        self.total = 0
+        self.hits = {}
+        self.fallthroughs = 0
+
+    def _train(self):
+        texts, labels = [], []
+        for intent, utterances in TRAINING_UTTERANCES.items():
+            texts.extend(utterances)
+            labels.extend([intent] * len(utterances))
+        classifier = make_pipeline(
+            TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4), sublinear_tf=True),
+            LogisticRegression(max_iter=1000, C=10)
+        )
+        classifier.fit(texts, labels)
+        return classifier
+
+    def set_categories(self, categories):
+        """Extend the category vocabulary with the categories present in the data.
+
+        'income' is left out: spending questions never take it as a category.
+        """
+        synonyms = {phrase: category for category, phrases in CATEGORY_SYNONYMS.items() for phrase in phrases}
+        for category in categories:
+            if category and category.lower() != 'income':
+                synonyms.setdefault(category.lower(), category)
+                synonyms.setdefault(category.lower().replace('_', ' '), category)
+        # Longest phrases first so "credit card payment" wins over shorter matches
+        phrases = sorted(synonyms, key=len, reverse=True)
+        self.category_phrases = [(re.compile(rf"\b{re.escape(p)}\b", re.IGNORECASE), synonyms[p]) for p in phrases]
+
+    def match_categories(self, query):
+        """Distinct categories named in the query, longest phrases first"""
+        categories = []
+        remaining = query
+        for pattern, category in self.category_phrases:
+            if pattern.search(remaining):
+                remaining = pattern.sub(' ', remaining)
+                if category not in categories:
+                    categories.append(category)
+        return categories
+
+    def extract_slots(self, query):
+        slots = {"timeframe": "all", "category": None, "merchant": None}
+        for timeframe, pattern in TIMEFRAME_PATTERNS:
+            if pattern.search(query):
+                slots["timeframe"] = timeframe
+                break
+        categories = self.match_categories(query)
+        if categories:
+            slots["category"] = categories[0]
+        merchant = MERCHANT_PATTERN.search(query)
+        if merchant:
+            slots["merchant"] = merchant.group(1).strip()
+        return slots
+
+    @staticmethod
+    def is_direct_lookup(query):
+        """True for plain questions about the user's own figures, not advice, ratios or other people"""
+        if ADVICE_PATTERN.search(query) or DERIVED_PATTERN.search(query) or OTHER_PERSON_PATTERN.search(query):
+            return False
+        return bool(FIRST_PERSON_PATTERN.search(query) or BARE_LOOKUP_PATTERN.match(query))
+
+    def is_unresolved(self, intent, query):
+        """True when the intent's single figure cannot answer the query as asked.
+
+        That is a part the aggregate does not cover, date wording other than
+        one supported timeframe, or more than one category or merchant.
+        """
+        unresolved = UNRESOLVED_PATTERNS.get(intent)
+        if unresolved is not None and unresolved.search(query):
+            return True
+
+        remaining = query
+        if intent in TIMEFRAME_INTENTS:
+            if sum(len(pattern.findall(query)) for _, pattern in TIMEFRAME_PATTERNS) > 1:
+                return True
+            for _, pattern in TIMEFRAME_PATTERNS:
+                remaining = pattern.sub(' ', remaining)
+        if DATE_PATTERN.search(remaining):
+            return True
+
+        if intent == 'spending':
+            return len(self.match_categories(query)) > 1
+        if intent == 'merchant_spending':
+            merchants = MERCHANT_PATTERN.findall(query)
+            return len(merchants) > 1 or any(MERCHANT_LIST_PATTERN.search(m) for m in merchants)
+        return False
+
+    def classify(self, query):
+        """Return (intent, confidence, source) without touching the metrics"""
+        if not self.is_direct_lookup(query):
+            return FALLTHROUGH, 1.0, 'rule'
+        for intent, pattern in RULES:
+            if pattern.search(query):
+                intent, confidence, source = intent, 1.0, 'rule'
+                break
+        else:
+            if self.classifier is None:
+                return FALLTHROUGH, 0.0, 'none'
+            probabilities = self.classifier.predict_proba([query])[0]
+            best = probabilities.argmax()
+            intent, confidence, source = str(self.classifier.classes_[best]), float(probabilities[best]), 'model'
+
+        if intent != FALLTHROUGH and self.is_unresolved(intent, query):
+            return FALLTHROUGH, 1.0, 'rule'
+        return intent, confidence, source
+
+    def route(self, query):
+        intent, confidence, source = self.classify(query)
+        if intent == FALLTHROUGH or confidence < self.threshold:
+            return None
+        return IntentMatch(intent, confidence, source, self.extract_slots(query))
+
+    def record(self, match):
+        """Count a query as answered locally (match) or passed to the LLM (None)"""
+        with self.lock:
+            self.total += 1
+            if match is None:
+                self.fallthroughs += 1
+            else:
+                self.hits[match.intent] = self.hits.get(match.intent, 0) + 1
+
+    def metrics(self):
+        with self.lock:
+            answered = sum(self.hits.values())
+            return {
+                "queries": self.total,
+                "answered_locally": answered,
+                "passed_to_llm": self.fallthroughs,
+                "hit_rate": round(answered / self.total, 3) if self.total else 0.0,
+                "hits_by_intent": dict(self.hits),
+                "classifier": "tfidf+logreg" if self.classifier is not None else "rules only"
+            }
+
+
+# Expected routing for questions the router has answered wrongly before;
+# run `python intent_router.py check` after changing the patterns or utterances
+ROUTING_CASES = [
+    ("What is my net worth?", 'net_worth'),
+    ("net worth", 'net_worth'),
+    ("What's my credit score?", 'credit_score'),
+    ("How much debt do I have?", 'total_liabilities'),
+    ("How much did I spend on food last month?", 'spending'),
+    ("How much did I spend at Starbucks this year?", 'merchant_spending'),
+    ("What is my income this year?", 'income'),
+    ("What percentage of my income goes to food?", FALLTHROUGH),
+    ("what is my income vs expenses ratio", FALLTHROUGH),
+    ("What would my net worth be if I sold my car?", FALLTHROUGH),
+    ("How is my credit score calculated?", FALLTHROUGH),
+    ("how much do i owe on my mortgage", FALLTHROUGH),
+    ("How much did I spend on income?", FALLTHROUGH),
+    ("Net worth of Elon Musk?", FALLTHROUGH),
+    ("What is the net worth of Elon Musk?", FALLTHROUGH),
+    ("What is my wife's credit score?", FALLTHROUGH),
+    ("How much income did I get last year?", 'income'),
+    ("How much did I spend on groceries and restaurants last month?", 'spending'),
+    ("How much did I spend in 2024?", FALLTHROUGH),
+    ("How much did I spend on food in March?", FALLTHROUGH),
+    ("How much did I spend yesterday?", FALLTHROUGH),
+    ("How much have I spent today?", FALLTHROUGH),
+    ("How much have I spent since January?", FALLTHROUGH),
+    ("How much did I spend in the last 2 weeks?", FALLTHROUGH),
+    ("What was my net worth in 2023?", FALLTHROUGH),
+    ("How much did I spend on food and transportation last month?", FALLTHROUGH),
+    ("How much did I spend at Starbucks and Walmart?", FALLTHROUGH),
+    ("How much did I spend at Starbucks or at Walmart this year?", FALLTHROUGH),
+    ("What is my salary?", FALLTHROUGH),
+    ("How much freelance income did I earn this year?", FALLTHROUGH),
+    ("How much income did I get from dividends?", FALLTHROUGH),
+]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Intent router tools")
+    parser.add_argument('command', choices=['check'], help="check: route ROUTING_CASES and report mismatches")
+    args = parser.parse_args()
+
+    router = IntentRouter(['food', 'transportation', 'utilities', 'income'])
+    failures = 0
+    for query, expected in ROUTING_CASES:
+        match = router.route(query)
+        routed = match.intent if match else FALLTHROUGH
+        if routed != expected:
+            failures += 1
+            print(f"FAIL {query!r}: expected {expected}, routed to {routed}")
+    print(f"{len(ROUTING_CASES) - failures}/{len(ROUTING_CASES)} routing cases passed")
+    raise SystemExit(1 if failures else 0)
@@ -0,0 +1,160 @@
+"""
+Load test for the ASGI serving mode with a scripted (offline) model
+
+    python loadtest.py --requests 2000 --concurrency 1000 --latency 1.0
+    python loadtest.py --server        # through a real uvicorn server
+
+Every request is an advice question, so it skips the local answers and goes
+to the model pool, which is replaced by a ScriptedModel that waits `latency`
+seconds per call. With the model awaited on the event loop, the number of
+requests in flight is limited by the client concurrency, not ASGI_IO_THREADS.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+# Keep the load test away from the persisted response cache and Gemini quota
+os.environ.setdefault('PERSIST_RESPONSE_CACHE', 'false')
+
+import main
+import asgi
+from model_pool import ModelPool, ScriptedModel
+
+
+class CountingModel(ScriptedModel):
+    """ScriptedModel that records how many calls were in progress at once"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.active = 0
+        self.peak_active = 0
+
+    async def generate_content_async(self, prompt):
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        try:
+            return await super().generate_content_async(prompt)
+        finally:
+            self.active -= 1
+
+
+def query_body(n):
+    return json.dumps({"query": f"Should I pay off my car loan early? (load test {n})"}).encode()
+
+
+async def call_in_process(app, n):
+    """Drive the ASGI app directly with one HTTP request"""
+    body = query_body(n)
+    scope = {
+        'type': 'http', 'method': 'POST', 'path': '/query', 'root_path': '', 'query_string': b'',
+        'http_version': '1.1', 'scheme': 'http', 'server': ('loadtest', 80), 'client': ('127.0.0.1', n),
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    status = {}
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status['code'] = message['status']
+
+    await app(scope, receive, send)
+    return status.get('code')
+
+
+async def call_server(host, port, n):
+    """One POST /query over a fresh HTTP/1.1 connection"""
+    body = query_body(n)
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(
+        f"POST /query HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read()
+    writer.close()
+    return int(status_line.split()[1])
+
+
+async def run_load(call, total, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+
+    async def one(n):
+        async with limit:
+            start = time.perf_counter()
+            try:
+                code = await call(n)
+            except OSError:
+                code = 'connection error'
+            latencies.append(time.perf_counter() - start)
+            statuses[code] = statuses.get(code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(total)))
+    return time.perf_counter() - start, sorted(latencies), statuses
+
+
+def start_server(app, host, port):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, lifespan='on', log_level='warning',
+                                           backlog=4096))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Load test the ASGI app with a scripted model")
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=1.0, help='Scripted model latency in seconds')
+    parser.add_argument('--server', action='store_true', help='Serve with uvicorn and connect over TCP')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    # Per-request INFO logs would dominate the run time
+    logging.getLogger().setLevel(logging.WARNING)
+
+    model = CountingModel('scripted-flash', script=[args.latency])
+    # No quota governor: the scripted model has no server-side limits to respect
+    main.model_pool = ModelPool([('scripted-flash', model)])
+    app = asgi.app
+
+    if args.server:
+        server, thread = start_server(app, args.host, args.port)
+        call = lambda n: call_server(args.host, args.port, n)
+    else:
+        call = lambda n: call_in_process(app, n)
+
+    elapsed, latencies, statuses = asyncio.run(run_load(call, args.requests, args.concurrency))
+
+    if args.server:
+        server.should_exit = True
+        thread.join()
+
+    print(f"Requests:            {args.requests} ({statuses})")
+    print(f"Client concurrency:  {args.concurrency}")
+    print(f"I/O worker threads:  {app.io_threads}")
+    print(f"Peak in flight:      {app.peak_in_flight} requests, {model.peak_active} concurrent model calls")
+    print(f"Wall time:           {elapsed:.2f}s ({args.requests / elapsed:.0f} req/s)")
+    print(f"Latency p50/p95/max: {latencies[len(latencies) // 2]:.2f}s / "
+          f"{latencies[int(len(latencies) * 0.95)]:.2f}s / {latencies[-1]:.2f}s")
+    threaded_floor = args.requests / app.io_threads * args.latency
+    print(f"A thread per request would need at least {threaded_floor:.0f}s with {app.io_threads} threads")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -1,6 +1,6 @@
-from flask import Flask, request, jsonify, session
+from flask import Flask, request, jsonify, session, g, Response, stream_with_context
 from flask_cors import CORS
-from flask_restx import Api, Namespace, Resource, fields, reqparse
+from flask_restx import Api, Namespace, Resource, fields, reqparse, inputs
 import json
 import os
 import logging
@@ -8,19 +8,35 @@ from datetime import datetime, timedelta
 import google.generativeai as genai
 import traceback
 import uuid
+import re
+import math
 import time
 import hashlib
+import threading
 from dotenv import load_dotenv
 
 # Enhanced Analytics Imports
-import statistics
-from collections import defaultdict
 try:
     import numpy as np
 except ImportError:
     # Fallback for basic statistics without numpy
     np = None
 
+from portfolio import PortfolioEngine, PriceFeed
+from debt import STRATEGIES as DEBT_STRATEGIES, extract_debts, simulate_payoff
+from rollup import GRAINS as ROLLUP_GRAINS, RollupCube
+from responses import FastJSONProvider, output_json, compress_response, compute_etag
+import export
+from quota import QuotaGovernor, QuotaExceeded, limits_for_model, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from model_pool import ModelPool, ModelUnavailable
+from intent_router import IntentRouter
+from response_store import ResponseStore
+from storage import create_storage
+from search_index import TransactionIndex, merchant_key
+from categorizer import TransactionCategorizer, label_version
+from profiling import RequestProfiler, PROFILE_HEADER
+from projections import extract_epf, project_epf, credit_utilization, project_credit_score
+
 load_dotenv()
 
 # Configure logging
@@ -30,6 +46,7 @@ logger = logging.getLogger(__name__)
 # Flask app and config
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
+app.json = FastJSONProvider(app)
 
 # Enable CORS for frontend integration
 CORS(app, origins=[
@@ -40,10 +57,49 @@ CORS(app, origins=[
 # Setup Flask-RESTX Api with Swagger
 api = Api(app, version='1.0', title='AI Finance Assistant API',
           description='API documentation for AI Finance Assistant backend', doc='/docs')
+api.representations['application/json'] = output_json
+
+# Opt-in request profiling; registered first so it wraps every other request hook
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(__file__), 'cache', 'profiles'))
+PROFILE_ADMIN_TOKEN = os.environ.get('PROFILE_ADMIN_TOKEN')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.0))  # fraction of requests run under cProfile
+PROFILE_SLOW_THRESHOLD = float(os.environ.get('PROFILE_SLOW_THRESHOLD', 0.0))  # seconds; 0 disables stack sampling
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.01))  # seconds between stack samples
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', 200))
+request_profiler = None
+if PROFILING_ENABLED:
+    request_profiler = RequestProfiler(PROFILE_DIR, PROFILE_ADMIN_TOKEN, PROFILE_SAMPLE_RATE,
+                                       PROFILE_SLOW_THRESHOLD, PROFILE_SAMPLE_INTERVAL, PROFILE_MAX_FILES)
+    request_profiler.init_app(app)
+
+# Response compression and conditional request settings
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))  # bytes
+# GET routes whose response is built only from the versioned data sets (and the
+# portfolio price version), so an ETag over data_versions identifies it exactly
+CONDITIONAL_ROUTES = frozenset({
+    '/data/<string:data_type>',
+    '/data/transactions/filter',
+    '/data/transactions/export',
+    '/data/transactions/search',
+    '/data/summary',
+    '/analytics/anomalies',
+    '/analytics/forecast',
+    '/analytics/trends',
+    '/analytics/budget-recommendations',
+    '/analytics/comprehensive',
+    '/analytics/portfolio',
+    '/analytics/debt-payoff',
+    '/analytics/epf-projection',
+    '/analytics/credit-projection',
+    '/analytics/rollup',
+})
 
 # Configure Gemini AI
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+MODEL_POOL_SIZE = int(os.environ.get('MODEL_POOL_SIZE', 3))
 model = None
+model_handles = []
 
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
@@ -67,20 +123,30 @@ if GEMINI_API_KEY:
             'models/gemini-pro'
         ]
         
-        # Find the first available preferred model
-        selected_model = None
+        # Pick available preferred models, one per family (aliases like -latest fail together)
+        selected_models = []
+        families = set()
         for preferred in preferred_models:
-            if preferred in available_models:
-                selected_model = preferred
-                break
+            family = re.sub(r'-(latest|\d{3})$', '', preferred)
+            if preferred in available_models and family not in families:
+                selected_models.append(preferred)
+                families.add(family)
+        selected_models = selected_models[:MODEL_POOL_SIZE]
+        
+        # Keep a pro-class model for complex queries when the pool is all flash
+        if selected_models and not any('pro' in name for name in selected_models):
+            pro_model = next((p for p in preferred_models if 'pro' in p and p in available_models), None)
+            if pro_model:
+                selected_models.append(pro_model)
         
         # If no preferred model is available, use the first available model
-        if not selected_model and available_models:
-            selected_model = available_models[0]
+        if not selected_models and available_models:
+            selected_models = [available_models[0]]
         
-        if selected_model:
-            model = genai.GenerativeModel(selected_model)
-            logger.info(f"Selected Gemini model: {selected_model}")
+        if selected_models:
+            model_handles = [(name, genai.GenerativeModel(name)) for name in selected_models]
+            model = model_handles[0][1]
+            logger.info(f"Selected Gemini models: {selected_models}")
         else:
             logger.error("No suitable Gemini models found")
     except Exception as e:
@@ -95,26 +161,237 @@ DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 # Simple in-memory cache for API responses (to reduce API calls)
 response_cache = {}
 CACHE_DURATION = 300  # 5 minutes cache
+PERSIST_RESPONSE_CACHE = os.environ.get('PERSIST_RESPONSE_CACHE', 'true').lower() == 'true'
+RESPONSE_CACHE_PATH = os.environ.get('RESPONSE_CACHE_PATH', os.path.join(os.path.dirname(__file__), 'cache', 'responses.sqlite3'))
+CACHE_PREWARM_FILE = os.environ.get('CACHE_PREWARM_FILE')  # one common query per line
+cache_compactor_stop = threading.Event()
+
+# Client-side Gemini quota governors, one per model
+quota_governors = {}
+quota_lock = threading.Lock()
+# Optional per-model limits, e.g. {"gemini-1.5-flash": {"rpm": 30, "tpm": 2000000}}
+QUOTA_OVERRIDES = json.loads(os.environ.get('GEMINI_QUOTA_OVERRIDES', '{}'))
+AI_QUEUE_TIMEOUT = float(os.environ.get('AI_QUEUE_TIMEOUT', 20))  # seconds
+AI_MAX_QUEUE = int(os.environ.get('AI_MAX_QUEUE', 100))
+NO_AI_RESPONSE = "Sorry, no response from AI now."
+
+# Debt payoff simulations cached per liabilities version
+debt_payoff_cache = {}
+debt_payoff_lock = threading.Lock()
+DEBT_PAYOFF_CACHE_SIZE = 128
+# Each budget is simulated for up to 600 months; schedules keep every month's balances
+MAX_DEBT_PAYOFF_BUDGETS = 100
+MAX_DEBT_PAYOFF_SCHEDULE_BUDGETS = 10
+DEFAULT_EXTRA_PAYMENTS = '0,50,100,250,500,1000'
+
+# EPF and credit-score projections cached per version of the data they read
+projection_cache = {}
+projection_lock = threading.Lock()
+PROJECTION_CACHE_SIZE = 128
+MAX_PROJECTION_SCENARIOS = 1000
+DEFAULT_EPF_INTEREST_RATES = '0.0725,0.0825,0.0925'
+DEFAULT_EPF_SALARY_GROWTH = '0.03,0.05,0.08'
+DEFAULT_UTILIZATION_TARGETS = '0.05,0.1,0.3,0.5'
+
+# Data refresh settings
+AUTO_REFRESH_DATA = os.environ.get('AUTO_REFRESH_DATA', 'false').lower() == 'true'
+DATA_REFRESH_INTERVAL = int(os.environ.get('DATA_REFRESH_INTERVAL', 300))  # 5 minutes
+
+# Storage backend: 'json' (flat files in DATA_DIR) or 'sqlite' (indexed, imports the JSON files when empty)
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json').lower()
+STORAGE_DB_PATH = os.environ.get('STORAGE_DB_PATH', os.path.join(DATA_DIR, 'finance.sqlite3'))
+storage = create_storage(STORAGE_BACKEND, DATA_DIR, STORAGE_DB_PATH)
+logger.info(f"Using {storage.name} storage backend")
 
 def load_financial_data():
-    data = {}
-    files = ['assets', 'liabilities', 'transactions', 'epf', 'credit_score', 'investments']
-    for fname in files:
-        try:
-            file_path = os.path.join(DATA_DIR, f'{fname}.json')
-            if os.path.exists(file_path):
-                with open(file_path, 'r') as f:
-                    data[fname] = json.load(f)
-                logger.info(f"Loaded {fname}.json successfully")
-            else:
-                logger.warning(f"File {fname}.json not found")
-                data[fname] = {}
-        except Exception as e:
-            logger.error(f"Error loading {fname}.json: {str(e)}")
-            data[fname] = {}
-    return data
+    return storage.load_all()
+
+def compute_data_version(document):
+    """Content hash of a data set, used to key derived caches"""
+    payload = json.dumps(document, sort_keys=True, default=str)
+    return hashlib.md5(payload.encode()).hexdigest()[:12]
 
 financial_data = load_financial_data()
+if storage.name == 'json':
+    storage.documents = financial_data
+data_versions = {name: compute_data_version(doc) for name, doc in financial_data.items()}
+
+# Portfolio engine recomputes investment figures from holdings and live prices
+PRICE_FILE = os.environ.get('PRICE_FILE', os.path.join(DATA_DIR, 'prices.json'))
+portfolio_engine = PortfolioEngine(financial_data.get('investments', {}).get('holdings', []))
+price_feed = PriceFeed(PRICE_FILE)
+
+# Dashboard rollups kept up to date on load, reload and append
+rollup_cube = RollupCube(financial_data.get('transactions', {}).get('transactions', []))
+
+# Description/merchant search index, maintained alongside the rollups
+search_index = TransactionIndex(financial_data.get('transactions', {}).get('transactions', []))
+
+# Callbacks notified when a data set is reloaded or appended to
+data_listeners = []
+data_lock = threading.RLock()
+data_refresher_stop = threading.Event()
+
+def on_data_change(listener):
+    """Register listener(data_type, change, records) for 'reload' and 'append' updates"""
+    data_listeners.append(listener)
+    return listener
+
+def notify_data_change(data_type, change, records=None):
+    if change == 'append':
+        # Chain the previous version with the new rows instead of re-hashing the whole data set
+        data_versions[data_type] = compute_data_version([data_versions.get(data_type), records])
+    else:
+        data_versions[data_type] = compute_data_version(financial_data.get(data_type, {}))
+    for listener in data_listeners:
+        try:
+            listener(data_type, change, records)
+        except Exception as e:
+            logger.error(f"Data listener {listener.__name__} failed for {data_type}: {e}")
+
+@on_data_change
+def update_rollup_cube(data_type, change, records):
+    if data_type != 'transactions':
+        return
+    if change == 'append':
+        rollup_cube.add(records)
+    else:
+        rollup_cube.rebuild(financial_data['transactions'].get('transactions', []))
+
+@on_data_change
+def update_search_index(data_type, change, records):
+    if data_type != 'transactions':
+        return
+    if change == 'append':
+        search_index.add(records)
+    else:
+        search_index.rebuild(financial_data['transactions'].get('transactions', []))
+
+def transaction_categories():
+    return {txn.get('category') for txn in financial_data.get('transactions', {}).get('transactions', [])}
+
+# Answers exact numeric questions locally before falling through to Gemini
+intent_router = IntentRouter(transaction_categories())
+
+@on_data_change
+def update_intent_categories(data_type, change, records):
+    if data_type == 'transactions':
+        intent_router.set_categories(transaction_categories())
+
+@on_data_change
+def update_portfolio_engine(data_type, change, records):
+    if data_type != 'investments':
+        return
+    portfolio_engine.load_holdings(financial_data['investments'].get('holdings', []))
+    # Re-apply the price file on top of the reloaded holdings
+    price_feed.mtime = None
+
+# Categorizes imported transactions that arrive without a category. Loaded on first use
+# and retrained when the ledger's labels differ from the ones the model was fit on
+CATEGORIZER_MODEL_PATH = os.environ.get('CATEGORIZER_MODEL_PATH', os.path.join(os.path.dirname(__file__), 'cache', 'categorizer.joblib'))
+CATEGORIZER_MIN_CONFIDENCE = float(os.environ.get('CATEGORIZER_MIN_CONFIDENCE', 0.5))
+categorizer = None
+categorizer_data_version = None
+categorizer_lock = threading.Lock()
+
+def get_categorizer():
+    """The categorizer for the current ledger, or None when it is unavailable"""
+    global categorizer, categorizer_data_version
+    with categorizer_lock:
+        with data_lock:
+            version = data_versions.get('transactions')
+            transactions = list(financial_data.get('transactions', {}).get('transactions', []))
+        if version == categorizer_data_version:
+            return categorizer
+        try:
+            labels = label_version(transactions)
+            # Appends the model categorized itself change the data but not the labels
+            if categorizer is None or categorizer.label_version != labels:
+                categorizer = TransactionCategorizer.load_or_train(
+                    CATEGORIZER_MODEL_PATH, transactions,
+                    min_confidence=CATEGORIZER_MIN_CONFIDENCE, label_version=labels
+                )
+        except Exception as e:
+            logger.error(f"Transaction categorizer unavailable: {e}")
+            categorizer = None
+        categorizer_data_version = version
+        return categorizer
+
+def reload_financial_data():
+    """Re-read the storage backend and notify listeners about the data sets that changed.
+
+    With the JSON backend this picks up edits to the data files. With SQLite
+    the database is the source of truth and the JSON files are not read;
+    load edited files with `python storage.py import` before reloading.
+    """
+    fresh = load_financial_data()
+    changed = []
+    with data_lock:
+        for name, document in fresh.items():
+            if compute_data_version(document) != data_versions.get(name):
+                financial_data[name] = document
+                notify_data_change(name, 'reload')
+                changed.append(name)
+    if changed:
+        logger.info(f"Reloaded data sets: {', '.join(changed)}")
+    return changed
+
+def append_transactions(new_transactions):
+    """Validate, store and publish newly imported transactions.
+
+    SQLite persists them; the JSON backend keeps them in memory only and
+    never rewrites the data files.
+    """
+    records = []
+    for txn in new_transactions:
+        if not isinstance(txn, dict):
+            raise ValueError("Each transaction must be an object")
+        try:
+            datetime.strptime(str(txn.get('date')), '%Y-%m-%d')
+            amount = float(txn['amount'])
+        except (KeyError, TypeError, ValueError):
+            amount = None
+        # float() also accepts "nan" and "inf", which would poison every total
+        if amount is None or not math.isfinite(amount):
+            raise ValueError(f"Transaction needs a YYYY-MM-DD date and numeric amount: {txn}")
+        
+        records.append({
+            "id": txn.get('id') or f"txn_{uuid.uuid4().hex[:8]}",
+            "date": txn['date'],
+            "description": txn.get('description', ''),
+            "amount": amount,
+            "category": txn.get('category'),
+            "account": txn.get('account', 'unknown'),
+            "type": txn.get('type') or ('credit' if amount > 0 else 'debit')
+        })
+    
+    uncategorized = [r for r in records if not r['category']]
+    model = get_categorizer() if uncategorized else None
+    if model is not None:
+        model.categorize(uncategorized)
+    for record in uncategorized:
+        record['category'] = record['category'] or 'other'
+    
+    with data_lock:
+        document = financial_data.setdefault('transactions', {})
+        document.setdefault('transactions', []).extend(records)
+        storage.append_transactions(records, document)
+        notify_data_change('transactions', 'append', records)
+    return records
+
+def start_data_refresher():
+    """Poll the data files in the background when AUTO_REFRESH_DATA is enabled"""
+    def refresh_loop():
+        while not data_refresher_stop.wait(DATA_REFRESH_INTERVAL):
+            try:
+                reload_financial_data()
+            except Exception as e:
+                logger.error(f"Background data refresh failed: {e}")
+    
+    thread = threading.Thread(target=refresh_loop, name='data-refresher', daemon=True)
+    thread.start()
+    logger.info(f"Data refresher started (every {DATA_REFRESH_INTERVAL}s)")
+    return thread
 
 # Default permissions
 default_permissions = {
@@ -127,51 +404,17 @@ default_permissions = {
 }
 
 # Utility functions
-def filter_transactions_by_timeframe(transactions, timeframe):
-    now = datetime.now()
-    if timeframe == "last_week":
-        start_date = now - timedelta(weeks=1)
-    elif timeframe == "last_month":
-        start_date = now - timedelta(days=30)
-    elif timeframe == "last_quarter":
-        start_date = now - timedelta(days=90)
-    elif timeframe == "last_year":
-        start_date = now - timedelta(days=365)
-    else:  # 'all'
-        return transactions
-    
-    filtered = []
-    for txn in transactions:
-        try:
-            t_date = datetime.strptime(txn['date'], '%Y-%m-%d')
-            if t_date >= start_date:
-                filtered.append(txn)
-        except ValueError:
-            logger.warning(f"Invalid date format in transaction: {txn}")
-    return filtered
-
-def calculate_spending_summary(transactions):
-    total_income = 0
-    total_expenses = 0
-    category_totals = {}
-    
-    for txn in transactions:
-        amount = txn.get('amount', 0)
-        category = txn.get('category', 'other')
-        
-        if amount > 0:
-            total_income += amount
-        else:
-            total_expenses += abs(amount)
-            category_totals[category] = category_totals.get(category, 0) + abs(amount)
-    
-    return {
-        "total_income": total_income,
-        "total_expenses": total_expenses,
-        "net_income": total_income - total_expenses,
-        "category_breakdown": category_totals,
-        "transaction_count": len(transactions)
-    }
+def timeframe_start_date(timeframe):
+    """First YYYY-MM-DD date inside a relative timeframe, or None for 'all'"""
+    windows = {"last_week": timedelta(weeks=1), "last_month": timedelta(days=30),
+               "last_quarter": timedelta(days=90), "last_year": timedelta(days=365)}
+    if timeframe not in windows:
+        return None
+    start = datetime.now() - windows[timeframe]
+    # Transactions are dated at midnight, so a window starting mid-day begins the next day
+    if start.time() != datetime.min.time():
+        start += timedelta(days=1)
+    return start.strftime('%Y-%m-%d')
 
 def calculate_net_worth(assets, liabilities):
     total_assets = 0
@@ -200,29 +443,28 @@ def calculate_net_worth(assets, liabilities):
     }
 
 # Enhanced Transaction Analysis Functions
-def detect_spending_anomalies(transactions):
-    """Detect unusual spending patterns"""
-    if len(transactions) < 5:
+def detect_spending_anomalies(source):
+    """Detect unusual spending patterns; source is the storage backend, which runs the queries"""
+    if source.transaction_count() < 5:
         return {"anomalies": [], "message": "Not enough data for anomaly detection"}
     
-    expenses = [abs(txn['amount']) for txn in transactions if txn['amount'] < 0]
-    if not expenses:
+    stats = source.expense_stats()
+    if not stats['count']:
         return {"anomalies": [], "message": "No expense transactions found"}
     
     # Calculate statistical thresholds
-    mean_expense = statistics.mean(expenses)
-    std_expense = statistics.stdev(expenses) if len(expenses) > 1 else 0
+    mean_expense = stats['mean']
+    std_expense = stats['stdev']
     threshold = mean_expense + (2 * std_expense)  # 2 standard deviations
     
     anomalies = []
-    for txn in transactions:
-        if txn['amount'] < 0 and abs(txn['amount']) > threshold:
-            anomalies.append({
-                "transaction": txn,
-                "amount": abs(txn['amount']),
-                "threshold": threshold,
-                "deviation": abs(txn['amount']) - threshold
-            })
+    for txn in source.expenses_above(threshold):
+        anomalies.append({
+            "transaction": txn,
+            "amount": abs(txn['amount']),
+            "threshold": threshold,
+            "deviation": abs(txn['amount']) - threshold
+        })
     
     return {
         "anomalies": anomalies,
@@ -232,21 +474,13 @@ def detect_spending_anomalies(transactions):
         "total_anomalies": len(anomalies)
     }
 
-def forecast_future_spending(transactions, months_ahead=3):
+def forecast_future_spending(source, months_ahead=3):
     """Predict future expenses based on historical data"""
-    if len(transactions) < 3:
+    if source.transaction_count() < 3:
         return {"error": "Not enough data for forecasting"}
     
-    # Group expenses by month
-    monthly_expenses = defaultdict(float)
-    for txn in transactions:
-        if txn['amount'] < 0:
-            try:
-                date = datetime.strptime(txn['date'], '%Y-%m-%d')
-                month_key = f"{date.year}-{date.month:02d}"
-                monthly_expenses[month_key] += abs(txn['amount'])
-            except ValueError:
-                continue
+    # Expenses grouped by month
+    monthly_expenses = source.monthly_expenses()
     
     if len(monthly_expenses) < 2:
         return {"error": "Not enough monthly data for forecasting"}
@@ -282,50 +516,31 @@ def forecast_future_spending(transactions, months_ahead=3):
         "data_quality": "good" if len(monthly_data) >= 6 else "limited"
     }
 
-def analyze_spending_trends(transactions):
+def analyze_spending_trends(source):
     """Analyze spending trends and patterns"""
-    if not transactions:
+    if not source.transaction_count():
         return {"error": "No transactions to analyze"}
     
-    # Category trends
-    category_trends = defaultdict(lambda: {"amounts": [], "dates": []})
-    monthly_totals = defaultdict(float)
-    
-    for txn in transactions:
-        if txn['amount'] < 0:  # Only expenses
-            category = txn.get('category', 'other')
-            amount = abs(txn['amount'])
-            
-            category_trends[category]["amounts"].append(amount)
-            category_trends[category]["dates"].append(txn['date'])
-            
-            try:
-                date = datetime.strptime(txn['date'], '%Y-%m-%d')
-                month_key = f"{date.year}-{date.month:02d}"
-                monthly_totals[month_key] += amount
-            except ValueError:
-                continue
-    
-    # Analyze each category
+    # Analyze each category with at least three expenses
     analysis = {}
-    for category, data in category_trends.items():
-        if len(data["amounts"]) >= 3:
-            amounts = data["amounts"]
-            avg_amount = sum(amounts) / len(amounts)
-            recent_avg = sum(amounts[-3:]) / min(3, len(amounts))
+    for category, stats in source.category_stats(recent=3).items():
+        if stats["count"] >= 3:
+            avg_amount = stats["total"] / stats["count"]
+            recent_avg = stats["recent_average"]
             
             trend = "increasing" if recent_avg > avg_amount * 1.1 else \
                    "decreasing" if recent_avg < avg_amount * 0.9 else "stable"
             
             analysis[category] = {
-                "total_spent": sum(amounts),
+                "total_spent": stats["total"],
                 "average_transaction": avg_amount,
-                "transaction_count": len(amounts),
+                "transaction_count": stats["count"],
                 "trend": trend,
                 "recent_average": recent_avg
             }
     
     # Overall trend
+    monthly_totals = source.monthly_expenses()
     if len(monthly_totals) >= 2:
         monthly_values = list(monthly_totals.values())
         overall_trend = "increasing" if monthly_values[-1] > monthly_values[0] else "decreasing"
@@ -339,24 +554,16 @@ def analyze_spending_trends(transactions):
         "top_categories": sorted(analysis.items(), key=lambda x: x[1]["total_spent"], reverse=True)[:5]
     }
 
-def generate_budget_recommendations(transactions):
+def generate_budget_recommendations(source):
     """Generate personalized budget recommendations"""
-    if not transactions:
+    if not source.transaction_count():
         return {"error": "No transactions to analyze"}
     
-    # Calculate current spending by category
-    category_spending = defaultdict(float)
-    total_income = 0
-    total_expenses = 0
-    
-    for txn in transactions:
-        if txn['amount'] > 0:
-            total_income += txn['amount']
-        else:
-            amount = abs(txn['amount'])
-            total_expenses += amount
-            category = txn.get('category', 'other')
-            category_spending[category] += amount
+    # Current spending by category
+    category_spending = {category: stats["total"] for category, stats in source.category_stats().items()}
+    totals = source.spending_summary()
+    total_income = totals["total_income"]
+    total_expenses = totals["total_expenses"]
     
     if total_expenses == 0:
         return {"error": "No expense data found"}
@@ -371,7 +578,7 @@ def generate_budget_recommendations(transactions):
     }
     
     recommendations = []
-    monthly_income = total_income / max(1, len(set(txn['date'][:7] for txn in transactions if txn['amount'] > 0)))
+    monthly_income = total_income / max(1, source.income_month_count())
     
     for category, current_spent in category_spending.items():
         if category in recommended_percentages:
@@ -421,6 +628,151 @@ def generate_budget_recommendations(transactions):
         "suggested_emergency_fund": monthly_income * 6
     }
 
+def get_portfolio_engine():
+    """Return the portfolio engine after applying any new prices from the price file"""
+    try:
+        prices = price_feed.poll()
+    except Exception as e:
+        logger.error(f"Error reading price file {PRICE_FILE}: {e}")
+        prices = None
+    
+    if prices:
+        updated = portfolio_engine.apply_prices(prices)
+        logger.info(f"Applied {len(prices)} prices, revalued {updated} holdings")
+    return portfolio_engine
+
+def get_debt_payoff(strategy, extra_payments, custom_order=None, include_schedule=False):
+    """Run (or reuse) a payoff simulation for the current liabilities version"""
+    limit = MAX_DEBT_PAYOFF_SCHEDULE_BUDGETS if include_schedule else MAX_DEBT_PAYOFF_BUDGETS
+    if len(set(extra_payments)) > limit:
+        raise ValueError(f"At most {limit} extra payment budgets per request"
+                         f"{' with schedule=true' if include_schedule else ''}")
+    version = data_versions.get('liabilities')
+    cache_key = (version, strategy, tuple(sorted(extra_payments)), tuple(custom_order or ()), include_schedule)
+    with debt_payoff_lock:
+        if cache_key in debt_payoff_cache:
+            return debt_payoff_cache[cache_key]
+    
+    debts = extract_debts(financial_data.get('liabilities', {}))
+    result = simulate_payoff(debts, extra_payments, strategy, custom_order, include_schedule=include_schedule)
+    result['liabilities_version'] = version
+    
+    # Drop results computed for older liabilities, then bound the cache size
+    with debt_payoff_lock:
+        for key in [k for k in debt_payoff_cache if k[0] != version]:
+            del debt_payoff_cache[key]
+        if len(debt_payoff_cache) >= DEBT_PAYOFF_CACHE_SIZE:
+            del debt_payoff_cache[next(iter(debt_payoff_cache))]
+        debt_payoff_cache[cache_key] = result
+    return result
+
+def get_projection(kind, sources, params, compute):
+    """Compute (or reuse) a projection for the current versions of its source data sets"""
+    version = tuple(data_versions.get(name) for name in sources)
+    cache_key = (kind, version, params)
+    with projection_lock:
+        if cache_key in projection_cache:
+            return projection_cache[cache_key]
+    
+    result = compute()
+    result['data_version'] = get_dataset_version(sources)
+    
+    with projection_lock:
+        for key in [k for k in projection_cache if k[0] == kind and k[1] != version]:
+            del projection_cache[key]
+        if len(projection_cache) >= PROJECTION_CACHE_SIZE:
+            del projection_cache[next(iter(projection_cache))]
+        projection_cache[cache_key] = result
+    return result
+
+def get_epf_projection(years=20, interest_rates=None, contribution_rates=None, salary_growths=None,
+                       balance=None, monthly_salary=None, include_schedule=False):
+    """EPF balance projection; rates not given come from epf.json or the defaults"""
+    base = extract_epf(financial_data.get('epf', {}))
+    balance = base['balance'] if balance is None else balance
+    monthly_salary = base['monthly_salary'] if monthly_salary is None else monthly_salary
+    if balance is None or monthly_salary is None:
+        raise ValueError("EPF data has no balance or monthly salary; pass balance and monthly_salary")
+    
+    interest_rates = tuple(interest_rates or (base['interest_rate'],))
+    contribution_rates = tuple(contribution_rates or (base['employee_rate'] + base['employer_rate'],))
+    salary_growths = tuple(salary_growths or (base['salary_growth'],))
+    if len(interest_rates) * len(contribution_rates) * len(salary_growths) > MAX_PROJECTION_SCENARIOS:
+        raise ValueError(f"At most {MAX_PROJECTION_SCENARIOS} scenarios per request")
+    
+    params = (years, interest_rates, contribution_rates, salary_growths, balance, monthly_salary, include_schedule)
+    return get_projection('epf', ('epf',), params, lambda: project_epf(
+        balance, monthly_salary, years, interest_rates, contribution_rates, salary_growths, include_schedule
+    ))
+
+def get_credit_projection(months=12, target_utilizations=(), include_liabilities=True, include_schedule=False,
+                          current_utilization=None):
+    """Credit-score projection from the score history and card utilization in liabilities.json.
+
+    current_utilization overrides the figure derived from liabilities; with
+    neither, target utilizations are rejected rather than compared to a guess.
+    """
+    credit_info = financial_data.get('credit_score', {})
+    if not isinstance(credit_info.get('current_score'), (int, float)):
+        raise ValueError("No current credit score available")
+    if len(target_utilizations) > MAX_PROJECTION_SCENARIOS:
+        raise ValueError(f"At most {MAX_PROJECTION_SCENARIOS} scenarios per request")
+    
+    if current_utilization is not None:
+        sources = ('credit_score',)
+        utilization = current_utilization
+    elif include_liabilities:
+        sources = ('credit_score', 'liabilities')
+        utilization = credit_utilization(financial_data.get('liabilities', {}))
+    else:
+        sources = ('credit_score',)
+        utilization = None
+    params = (months, tuple(target_utilizations), include_schedule, utilization)
+    return get_projection('credit', sources, params, lambda: project_credit_score(
+        credit_info['current_score'], credit_info.get('history'), utilization,
+        target_utilizations, months, include_schedule
+    ))
+
+def parse_float_list(value, name):
+    """Comma-separated numbers from a query argument"""
+    try:
+        return [float(x) for x in (value or '').split(',') if x.strip()]
+    except ValueError:
+        raise ValueError(f"{name} must be a comma-separated list of numbers")
+
+def get_request_etag():
+    """ETag for a GET on one of CONDITIONAL_ROUTES, derived from dataset versions"""
+    engine = get_portfolio_engine()  # picks up price file changes before hashing
+    return compute_etag(
+        request.full_path,
+        sorted(data_versions.items()),
+        engine.version,
+        session.get('permissions', default_permissions),
+        # Relative timeframes (last_month, ...) move with the calendar
+        datetime.now().strftime('%Y-%m-%d')
+    )
+
+@app.before_request
+def check_not_modified():
+    """Answer 304 before running the handler when the client copy is current"""
+    if request.method != 'GET' or request.url_rule is None or request.url_rule.rule not in CONDITIONAL_ROUTES:
+        return None
+    g.etag = get_request_etag()
+    if request.if_none_match.contains_weak(g.etag):
+        response = app.response_class(status=304)
+        response.set_etag(g.etag, weak=True)
+        return response
+    return None
+
+@app.after_request
+def finalize_response(response):
+    etag = g.get('etag')
+    if etag and response.status_code == 200:
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+    return compress_response(response, request.headers.get('Accept-Encoding'), COMPRESSION_MIN_SIZE)
+
 def get_conversation_context():
     if 'conversation_history' not in session:
         session['conversation_history'] = []
@@ -446,11 +798,40 @@ def filter_data_by_permissions(data_type):
     else:
         return {}
 
+def get_dataset_version(context_keys):
+    """Combined version of the data sets an answer was generated from"""
+    return compute_etag(sorted((k, data_versions.get(k)) for k in context_keys))[:12]
+
+def query_transactions(start=None, end=None, category=None, account=None, columns=None):
+    """Permission-checked transaction query with filters pushed down to the storage backend"""
+    if not filter_data_by_permissions('transactions'):
+        return iter(())
+    return storage.iter_transactions(start, end, category, account, columns)
+
+def spending_totals():
+    """Whole-ledger spending summary: a SQL aggregate under SQLite, the rollup cube otherwise"""
+    if storage.name == 'sqlite':
+        summary = storage.spending_summary()
+        summary.pop('category_counts', None)
+        return summary
+    return rollup_cube.spending_summary()
+
+def validate_date_bounds(args):
+    """Error message for a malformed start/end query argument, or None"""
+    for bound in ('start', 'end'):
+        if args.get(bound):
+            try:
+                datetime.strptime(args[bound], '%Y-%m-%d')
+            except ValueError:
+                return f"Invalid {bound} date, expected YYYY-MM-DD"
+    return None
+
 def get_cache_key(user_query, context_keys):
     """Generate a cache key for the query"""
     query_hash = hashlib.md5(user_query.encode()).hexdigest()
     context_str = "_".join(sorted(context_keys))
-    return f"{query_hash}_{context_str}"
+    # Answers go stale when any of the data they were based on changes
+    return f"{query_hash}_{context_str}_{get_dataset_version(context_keys)}"
 
 def get_cached_response(cache_key):
     """Get cached response if still valid"""
@@ -464,35 +845,252 @@ def get_cached_response(cache_key):
             del response_cache[cache_key]
     return None
 
-def cache_response(cache_key, response):
+def cache_response(cache_key, response, context_keys=()):
     """Cache the response"""
-    response_cache[cache_key] = (time.time(), response)
-
-def make_ai_request_with_retry(prompt, max_retries=3):
-    """Make AI request with exponential backoff retry logic"""
-    for attempt in range(max_retries):
+    cached_time = time.time()
+    response_cache[cache_key] = (cached_time, response)
+    if response_store is not None:
         try:
-            response = model.generate_content(prompt)
-            return response.text if response.text else "Sorry, no response from AI now."
+            response_store.put(cache_key, cached_time, context_keys, get_dataset_version(context_keys), response)
         except Exception as e:
-            error_str = str(e)
-            logger.warning(f"AI request attempt {attempt + 1} failed: {error_str}")
-            
-            # Check if it's a rate limit error
-            if "429" in error_str or "rate limit" in error_str.lower():
-                if attempt < max_retries - 1:
-                    # Exponential backoff: wait 2^attempt seconds
-                    wait_time = 2 ** attempt
-                    logger.info(f"Rate limit hit, waiting {wait_time} seconds before retry...")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    return "AI service rate limit exceeded. Please wait a few minutes before trying again."
-            else:
-                # For other errors, don't retry
-                raise e
+            logger.warning(f"Could not persist cached response: {e}")
+
+def warm_start_response_cache():
+    """Reload still-valid persisted responses into the in-memory cache"""
+    if response_store is None:
+        return 0
+    entries = response_store.load_valid(get_dataset_version)
+    for cache_key, cached_time, response in entries:
+        response_cache[cache_key] = (cached_time, response)
+    logger.info(f"Warm-started response cache with {len(entries)} persisted entries")
+    return len(entries)
+
+def start_cache_compactor():
+    """Drop expired and stale-version persisted responses in the background"""
+    def compact_loop():
+        while True:
+            try:
+                removed = response_store.compact(get_dataset_version)
+                if removed:
+                    logger.info(f"Compacted {removed} persisted cache entries")
+            except Exception as e:
+                logger.error(f"Response cache compaction failed: {e}")
+            if cache_compactor_stop.wait(CACHE_DURATION):
+                return
+    
+    thread = threading.Thread(target=compact_loop, name='cache-compactor', daemon=True)
+    thread.start()
+    return thread
+
+response_store = None
+if PERSIST_RESPONSE_CACHE:
+    try:
+        response_store = ResponseStore(RESPONSE_CACHE_PATH, CACHE_DURATION)
+        warm_start_response_cache()
+    except Exception as e:
+        logger.error(f"Persistent response cache disabled: {e}")
+        response_store = None
+
+def get_quota_governor(model_name):
+    """Return the quota governor for a model, creating it from the configured limits"""
+    with quota_lock:
+        governor = quota_governors.get(model_name)
+        if governor is None:
+            limits = limits_for_model(model_name, QUOTA_OVERRIDES)
+            governor = QuotaGovernor(model_name, limits['rpm'], limits['tpm'], max_queue=AI_MAX_QUEUE)
+            quota_governors[model_name] = governor
+            logger.info(f"Quota governor for {model_name}: {limits['rpm']} RPM, {limits['tpm']} TPM")
+        return governor
+
+TIMEFRAME_LABELS = {
+    "all": "across all recorded transactions",
+    "last_week": "in the last week",
+    "last_month": "in the last month",
+    "last_quarter": "in the last quarter",
+    "last_year": "in the last year"
+}
+
+# Data each local intent needs; the query falls through if it is not permitted
+INTENT_DATA = {
+    "net_worth": ("assets", "liabilities"),
+    "total_assets": ("assets",),
+    "total_liabilities": ("liabilities",),
+    "spending": ("transactions",),
+    "merchant_spending": ("transactions",),
+    "income": ("transactions",),
+    "credit_score": ("credit_score",)
+}
+
+def answer_locally(user_query, context_data):
+    """Answer numeric questions from the analytics layer; returns (response, data used) or None"""
+    match = intent_router.route(user_query)
+    required = INTENT_DATA.get(match.intent, ()) if match else ()
+    if match is None or not all(context_data.get(k) for k in required):
+        intent_router.record(None)
+        return None
+    
+    if match.intent in ('net_worth', 'total_assets', 'total_liabilities'):
+        worth = calculate_net_worth(context_data.get('assets', {}), context_data.get('liabilities', {}))
+        if match.intent == 'net_worth':
+            response = (f"• Your net worth is ${worth['net_worth']:,.2f}\n"
+                        f"  - Total assets: ${worth['total_assets']:,.2f}\n"
+                        f"  - Total liabilities: ${worth['total_liabilities']:,.2f}")
+        elif match.intent == 'total_assets':
+            response = f"• Your total assets are worth ${worth['total_assets']:,.2f}"
+        else:
+            response = f"• Your total liabilities are ${worth['total_liabilities']:,.2f}"
+    
+    elif match.intent in ('spending', 'income'):
+        timeframe = match.slots['timeframe']
+        category = match.slots['category']
+        summary = storage.spending_summary(start=timeframe_start_date(timeframe))
+        period = TIMEFRAME_LABELS[timeframe]
+        
+        if match.intent == 'income':
+            response = f"• Your income {period} was ${summary['total_income']:,.2f}"
+        elif category:
+            spent = summary['category_breakdown'].get(category, 0)
+            count = summary['category_counts'].get(category, 0)
+            response = (f"• You spent ${spent:,.2f} on {category.replace('_', ' ')} {period}\n"
+                        f"  - {count} transaction{'s' if count != 1 else ''}")
+        else:
+            response = f"• You spent ${summary['total_expenses']:,.2f} {period}"
+            top = sorted(summary['category_breakdown'].items(), key=lambda x: x[1], reverse=True)[:3]
+            for name, amount in top:
+                response += f"\n  - {name.replace('_', ' ').title()}: ${amount:,.2f}"
     
-    return "AI service temporarily unavailable. Please try again later."
+    elif match.intent == 'merchant_spending':
+        timeframe = match.slots['timeframe']
+        merchant = match.slots['merchant']
+        # A merchant made only of numbers or punctuation would match nearly everything
+        if not merchant or not merchant_key(merchant):
+            intent_router.record(None)
+            return None
+        found = search_index.search(query=merchant, start=timeframe_start_date(timeframe), page_size=0)
+        if not found or not found['total_results']:
+            intent_router.record(None)
+            return None
+        totals = found['totals']
+        names = ', '.join(sorted(totals['by_merchant']))
+        period = TIMEFRAME_LABELS[timeframe]
+        if totals['total_spent'] or not totals['total_income']:
+            response = f"• You spent ${totals['total_spent']:,.2f} at {names} {period}"
+        else:
+            response = f"• You received ${totals['total_income']:,.2f} from {names} {period}"
+        response += f"\n  - {totals['count']} transaction{'s' if totals['count'] != 1 else ''}"
+    
+    else:  # credit_score
+        credit_info = context_data['credit_score']
+        if 'current_score' not in credit_info:
+            intent_router.record(None)
+            return None
+        response = f"• Your credit score is {credit_info['current_score']} ({credit_info.get('score_range', 'Unknown')})"
+        history = credit_info.get('history') or []
+        if history and 'change' in history[0]:
+            response += f"\n  - Change since the last report: {history[0]['change']:+d} points"
+        if credit_info.get('last_updated'):
+            response += f"\n  - Last updated: {credit_info['last_updated']}"
+    
+    intent_router.record(match)
+    logger.info(f"Answered locally as {match.intent} ({match.source}, {match.confidence:.2f})")
+    return response, list(required)
+
+# Route each prompt to the best model in the pool, failing over between them
+model_pool = ModelPool(model_handles, governor_for=get_quota_governor) if model_handles else None
+
+def make_ai_request_with_retry(prompt, user_query=None, max_retries=3, priority=PRIORITY_INTERACTIVE):
+    """Make AI request through the model pool, failing over on transient errors and rate limits"""
+    response, model_name = model_pool.generate(prompt, user_query, priority=priority,
+                                               max_attempts=max_retries, queue_timeout=AI_QUEUE_TIMEOUT)
+    logger.info(f"AI response served by {model_name}")
+    return response.text if response.text else NO_AI_RESPONSE
+
+async def make_ai_request_async(prompt, user_query=None, max_retries=3, priority=PRIORITY_INTERACTIVE):
+    """make_ai_request_with_retry for the ASGI server; awaits the model without holding a thread"""
+    response, model_name = await model_pool.generate_async(prompt, user_query, priority=priority,
+                                                           max_attempts=max_retries, queue_timeout=AI_QUEUE_TIMEOUT)
+    logger.info(f"AI response served by {model_name}")
+    return response.text if response.text else NO_AI_RESPONSE
+
+def prepare_ai_query(data):
+    """First half of /query: validate, then answer locally or from cache when possible.
+
+    Returns (response, None) when the request is already answered, or
+    (None, pending) with the prompt still to be sent to the model pool.
+    """
+    if not data or 'query' not in data:
+        return ({"error": "Query is required"}, 400), None
+    
+    user_query = data['query'].strip()
+    if not user_query:
+        return ({"error": "Query cannot be empty"}, 400), None
+    
+    conversation_history = get_conversation_context()
+    perms = session.get('permissions', default_permissions)
+    context_data = {k: financial_data[k] for k, v in perms.items() if v and k in financial_data}
+    
+    local_answer = answer_locally(user_query, context_data)
+    if local_answer:
+        ai_response, data_used = local_answer
+        add_to_conversation_context(user_query, ai_response)
+        return ({
+            "response": ai_response,
+            "timestamp": datetime.now().isoformat(),
+            "context_used": data_used,
+            "answered_locally": True
+        }, 200), None
+    
+    if model_pool is None:
+        return ({"error": "AI service not available. Please check GEMINI_API_KEY configuration and available models."}, 503), None
+    
+    pending = {
+        "user_query": user_query,
+        "context_keys": list(context_data.keys()),
+        "cache_key": get_cache_key(user_query, list(context_data.keys()))
+    }
+    
+    # Check cache first
+    cached_response = get_cached_response(pending['cache_key'])
+    if cached_response:
+        return complete_ai_query(pending, cached_response, cache=False), None
+    
+    pending['prompt'] = generate_ai_prompt(user_query, context_data, conversation_history)
+    return None, pending
+
+def complete_ai_query(pending, ai_response=None, error=None, cache=True):
+    """Second half of /query: cache the answer or map the model error, then record the exchange"""
+    if isinstance(error, QuotaExceeded):
+        logger.warning(f"AI request not admitted: {error}")
+        return {
+            "error": "AI service rate limit exceeded. Please wait a few minutes before trying again.",
+            "retry_after": round(error.retry_after, 1) if error.retry_after else None
+        }, 429
+    if isinstance(error, ModelUnavailable):
+        logger.error(f"No AI model available: {error}")
+        return {"error": "AI service temporarily unavailable. Please try again later."}, 503
+    
+    if error is not None:
+        logger.error(f"Gemini API error: {error}")
+        # Provide more specific error messages based on the error type
+        if "404" in str(error) and "not found" in str(error):
+            ai_response = f"AI model configuration error: The selected model is not available. Please check your API configuration."
+        elif "403" in str(error):
+            ai_response = f"AI service access denied: Please verify your API key permissions."
+        else:
+            ai_response = f"Technical difficulties with AI service: {error}"
+    elif cache and ai_response != NO_AI_RESPONSE:
+        # Cache the successful response
+        cache_response(pending['cache_key'], ai_response, pending['context_keys'])
+    
+    user_query = pending['user_query']
+    add_to_conversation_context(user_query, ai_response)
+    logger.info(f"AI Query processed - User: {user_query[:50]}...")
+    
+    return {
+        "response": ai_response,
+        "timestamp": datetime.now().isoformat(),
+        "context_used": pending['context_keys']
+    }, 200
 
 # API namespaces
 perm_ns = Namespace('permissions', description='User permissions management')
@@ -532,6 +1130,80 @@ data_type_parser.add_argument('data_type', location='view_args', required=True,
 transactions_filter_parser = reqparse.RequestParser()
 transactions_filter_parser.add_argument('timeframe', type=str, choices=('all', 'last_week', 'last_month', 'last_quarter', 'last_year'), default='all', location='args')
 
+portfolio_parser = reqparse.RequestParser()
+portfolio_parser.add_argument('group_by', type=str, choices=PortfolioEngine.GROUP_FIELDS, default='type', location='args')
+
+debt_payoff_parser = reqparse.RequestParser()
+debt_payoff_parser.add_argument('strategy', type=str, choices=DEBT_STRATEGIES, default='avalanche', location='args')
+debt_payoff_parser.add_argument('extra', type=str, default=DEFAULT_EXTRA_PAYMENTS, location='args',
+                                help='Comma-separated extra monthly payment budgets to compare')
+debt_payoff_parser.add_argument('order', type=str, location='args',
+                                help='Comma-separated liability ids for the custom strategy')
+debt_payoff_parser.add_argument('schedule', type=inputs.boolean, default=False, location='args',
+                                help='Include month-by-month balances for each budget')
+
+epf_projection_parser = reqparse.RequestParser()
+epf_projection_parser.add_argument('years', type=int, default=20, location='args')
+epf_projection_parser.add_argument('interest_rates', type=str, default=DEFAULT_EPF_INTEREST_RATES, location='args',
+                                   help='Comma-separated annual interest rates (fractions)')
+epf_projection_parser.add_argument('contribution_rates', type=str, location='args',
+                                   help='Comma-separated combined contribution rates of basic pay (defaults to epf.json)')
+epf_projection_parser.add_argument('salary_growth', type=str, default=DEFAULT_EPF_SALARY_GROWTH, location='args',
+                                   help='Comma-separated annual salary growth rates')
+epf_projection_parser.add_argument('balance', type=float, location='args', help='Override the current EPF balance')
+epf_projection_parser.add_argument('monthly_salary', type=float, location='args', help='Override the monthly basic salary')
+epf_projection_parser.add_argument('schedule', type=inputs.boolean, default=False, location='args',
+                                   help='Include year-by-year balances')
+
+credit_projection_parser = reqparse.RequestParser()
+credit_projection_parser.add_argument('months', type=int, default=12, location='args')
+credit_projection_parser.add_argument('utilization', type=str, default=DEFAULT_UTILIZATION_TARGETS, location='args',
+                                      help='Comma-separated target credit utilization ratios')
+credit_projection_parser.add_argument('schedule', type=inputs.boolean, default=False, location='args',
+                                      help='Include month-by-month scores')
+credit_projection_parser.add_argument('current_utilization', type=float, location='args',
+                                      help='Current utilization ratio; required for targets when liabilities are not shared')
+
+rollup_parser = reqparse.RequestParser()
+rollup_parser.add_argument('grain', type=str, choices=ROLLUP_GRAINS, default='month', location='args')
+rollup_parser.add_argument('start', type=str, location='args', help='First date (YYYY-MM-DD), snapped to the grain')
+rollup_parser.add_argument('end', type=str, location='args', help='Last date (YYYY-MM-DD), snapped to the grain')
+rollup_parser.add_argument('group_by', type=str, default='category', location='args',
+                           help='Comma-separated dimensions: category, account, sign')
+rollup_parser.add_argument('by_time', type=inputs.boolean, default=True, location='args',
+                           help='Break results down per time bucket')
+rollup_parser.add_argument('category', type=str, location='args', help='Comma-separated categories to keep')
+rollup_parser.add_argument('account', type=str, location='args', help='Comma-separated accounts to keep')
+rollup_parser.add_argument('sign', type=str, choices=('income', 'expense'), location='args')
+
+export_parser = reqparse.RequestParser()
+export_parser.add_argument('format', type=str, choices=export.EXPORT_FORMATS, default='csv', location='args')
+export_parser.add_argument('start', type=str, location='args', help='First date to include (YYYY-MM-DD)')
+export_parser.add_argument('end', type=str, location='args', help='Last date to include (YYYY-MM-DD)')
+export_parser.add_argument('columns', type=str, location='args', help='Comma-separated columns to export')
+export_parser.add_argument('chunk_size', type=int, default=5000, location='args', help='Rows per CSV block or Arrow batch')
+
+search_parser = reqparse.RequestParser()
+search_parser.add_argument('q', type=str, location='args', help='Words or word prefixes from the description')
+search_parser.add_argument('merchant', type=str, location='args', help='Merchant name or prefix')
+search_parser.add_argument('category', type=str, location='args')
+search_parser.add_argument('start', type=str, location='args', help='First date to include (YYYY-MM-DD)')
+search_parser.add_argument('end', type=str, location='args', help='Last date to include (YYYY-MM-DD)')
+search_parser.add_argument('fuzzy', type=inputs.boolean, default=True, location='args',
+                           help='Match close spellings when a word has no exact or prefix match')
+search_parser.add_argument('page', type=int, default=1, location='args')
+search_parser.add_argument('page_size', type=int, default=50, location='args')
+
+append_transactions_model = data_ns.model('AppendTransactions', {
+    "transactions": fields.List(fields.Raw, required=True, description="Transactions with date, amount, description, category and account")
+})
+
+rebalance_model = analytics_ns.model('RebalanceRequest', {
+    "target_allocation": fields.Raw(required=True, description="Target weights per group, e.g. {\"mutual_fund\": 60, \"stock\": 40}"),
+    "group_by": fields.String(default='type', description="Holding field to group by: type, symbol or user_id"),
+    "min_trade": fields.Float(default=0, description="Skip trades smaller than this amount")
+})
+
 # Permission Resource
 @perm_ns.route('')
 class Permissions(Resource):
@@ -563,8 +1235,9 @@ class FinancialData(Resource):
         if data_type not in allowed:
             return {"error": "Invalid data type"}, 400
         
-        filtered = filter_data_by_permissions(data_type)
-        return jsonify(filtered)
+        if not filter_data_by_permissions(data_type):
+            return jsonify({})
+        return jsonify(storage.get_document(data_type))
 
 @data_ns.route('/transactions/filter')
 class FilteredTransactions(Resource):
@@ -577,12 +1250,123 @@ class FilteredTransactions(Resource):
         if not transactions_data or 'transactions' not in transactions_data:
             return {"transactions": []}
         
-        transactions = transactions_data['transactions']
-        if timeframe != 'all':
-            transactions = filter_transactions_by_timeframe(transactions, timeframe)
-        
+        transactions = list(query_transactions(start=timeframe_start_date(timeframe)))
         return {"transactions": transactions, "timeframe": timeframe}
 
+@data_ns.route('/transactions/export')
+class ExportTransactions(Resource):
+    @data_ns.expect(export_parser)
+    def get(self):
+        """Stream transactions as CSV chunks or an Arrow IPC stream"""
+        args = export_parser.parse_args()
+        transactions_data = filter_data_by_permissions('transactions')
+        if not transactions_data or 'transactions' not in transactions_data:
+            return {"error": "No transaction data available"}, 400
+        
+        fmt = args['format']
+        if fmt == 'arrow' and export.pa is None:
+            return {"error": "Arrow export requires pyarrow to be installed"}, 400
+        if not 1 <= args['chunk_size'] <= 100000:
+            return {"error": "chunk_size must be between 1 and 100000"}, 400
+        
+        error = validate_date_bounds(args)
+        if error:
+            return {"error": error}, 400
+        
+        try:
+            columns = export.resolve_columns([c.strip() for c in (args.get('columns') or '').split(',') if c.strip()])
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        
+        rows = query_transactions(start=args.get('start'), end=args.get('end'), columns=columns)
+        stream = export.export_stream(rows, fmt, columns, chunk_size=args['chunk_size'])
+        extension = 'arrows' if fmt == 'arrow' else fmt
+        return Response(stream_with_context(stream), mimetype=export.MIMETYPES[fmt], headers={
+            "Content-Disposition": f"attachment; filename=transactions.{extension}"
+        })
+
+@data_ns.route('/transactions/search')
+class SearchTransactions(Resource):
+    @data_ns.expect(search_parser)
+    def get(self):
+        """Search descriptions and merchants with prefix/fuzzy matching, filters and totals"""
+        args = search_parser.parse_args()
+        transactions_data = filter_data_by_permissions('transactions')
+        if not transactions_data or 'transactions' not in transactions_data:
+            return {"error": "No transaction data available"}, 400
+        
+        if not (args.get('q') or args.get('merchant')):
+            return {"error": "A search query (q) or merchant is required"}, 400
+        if args['page'] < 1 or not 1 <= args['page_size'] <= 500:
+            return {"error": "page must be at least 1 and page_size between 1 and 500"}, 400
+        error = validate_date_bounds(args)
+        if error:
+            return {"error": error}, 400
+        
+        try:
+            return search_index.search(args.get('q'), args.get('merchant'), args.get('start'), args.get('end'),
+                                       args.get('category'), args['fuzzy'], args['page'], args['page_size'])
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+@data_ns.route('/transactions/append')
+class AppendTransactions(Resource):
+    @data_ns.expect(append_transactions_model)
+    def post(self):
+        """Append imported transactions to the ledger"""
+        data = request.json
+        if not data or not isinstance(data.get('transactions'), list):
+            return {"error": "A list of transactions is required"}, 400
+        if not session.get('permissions', default_permissions).get('transactions', False):
+            return {"error": "Transactions access not permitted"}, 403
+        
+        try:
+            records = append_transactions(data['transactions'])
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        
+        logger.info(f"Appended {len(records)} transactions")
+        auto_categorized = sum(1 for r in records if 'category_confidence' in r)
+        return {"appended": len(records), "auto_categorized": auto_categorized, "transactions": records}, 201
+
+@data_ns.route('/transactions/categorize')
+class CategorizeTransactions(Resource):
+    def get(self):
+        """Categorizer status and memo cache counters"""
+        model = get_categorizer()
+        if model is None:
+            return {"error": "Transaction categorizer is not available"}, 503
+        return model.metrics()
+    
+    @data_ns.expect(append_transactions_model)
+    def post(self):
+        """Predict categories for a batch of transactions without storing them"""
+        data = request.json
+        if not data or not isinstance(data.get('transactions'), list):
+            return {"error": "A list of transactions is required"}, 400
+        model = get_categorizer()
+        if model is None:
+            return {"error": "Transaction categorizer is not available"}, 503
+        if not all(isinstance(txn, dict) for txn in data['transactions']):
+            return {"error": "Each transaction must be an object"}, 400
+        
+        try:
+            predictions = model.predict(data['transactions'])
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        return {"predictions": [
+            {"category": category if confidence >= model.min_confidence else 'other',
+             "predicted": category, "confidence": round(confidence, 3), "source": source}
+            for category, confidence, source in predictions
+        ]}
+
+@data_ns.route('/reload')
+class ReloadData(Resource):
+    def post(self):
+        """Reload the data from storage (the JSON files, or the database when STORAGE_BACKEND=sqlite)"""
+        changed = reload_financial_data()
+        return {"reloaded": changed, "versions": data_versions}
+
 @data_ns.route('/summary')
 class FinancialSummary(Resource):
     @data_ns.marshal_with(financial_summary_model)
@@ -598,9 +1382,11 @@ class FinancialSummary(Resource):
             summary['net_worth'] = calculate_net_worth(assets, liabilities)
         
         if transactions_data and 'transactions' in transactions_data:
-            summary['spending'] = calculate_spending_summary(transactions_data['transactions'])
+            summary['spending'] = spending_totals()
         
-        if investments and 'portfolio' in investments:
+        if investments and investments.get('holdings'):
+            summary['investments'] = get_portfolio_engine().summary()['portfolio']
+        elif investments and 'portfolio' in investments:
             summary['investments'] = investments['portfolio']
         
         return summary
@@ -614,8 +1400,7 @@ class SpendingAnomalies(Resource):
         if not transactions_data or 'transactions' not in transactions_data:
             return {"error": "No transaction data available"}, 400
         
-        transactions = transactions_data['transactions']
-        anomalies = detect_spending_anomalies(transactions)
+        anomalies = detect_spending_anomalies(storage)
         return anomalies
 
 @analytics_ns.route('/forecast')
@@ -630,8 +1415,7 @@ class SpendingForecast(Resource):
         if not transactions_data or 'transactions' not in transactions_data:
             return {"error": "No transaction data available"}, 400
         
-        transactions = transactions_data['transactions']
-        forecast = forecast_future_spending(transactions, args['months'])
+        forecast = forecast_future_spending(storage, args['months'])
         return forecast
 
 @analytics_ns.route('/trends')
@@ -642,8 +1426,7 @@ class SpendingTrends(Resource):
         if not transactions_data or 'transactions' not in transactions_data:
             return {"error": "No transaction data available"}, 400
         
-        transactions = transactions_data['transactions']
-        trends = analyze_spending_trends(transactions)
+        trends = analyze_spending_trends(storage)
         return trends
 
 @analytics_ns.route('/budget-recommendations')
@@ -654,8 +1437,7 @@ class BudgetRecommendations(Resource):
         if not transactions_data or 'transactions' not in transactions_data:
             return {"error": "No transaction data available"}, 400
         
-        transactions = transactions_data['transactions']
-        recommendations = generate_budget_recommendations(transactions)
+        recommendations = generate_budget_recommendations(storage)
         return recommendations
 
 @analytics_ns.route('/comprehensive')
@@ -666,70 +1448,177 @@ class ComprehensiveAnalytics(Resource):
         if not transactions_data or 'transactions' not in transactions_data:
             return {"error": "No transaction data available"}, 400
         
-        transactions = transactions_data['transactions']
+        return {
+            "anomalies": detect_spending_anomalies(storage),
+            "forecast": forecast_future_spending(storage, 3),
+            "trends": analyze_spending_trends(storage),
+            "budget_recommendations": generate_budget_recommendations(storage),
+            "summary": spending_totals()
+        }
+
+@analytics_ns.route('/portfolio')
+class PortfolioAnalytics(Resource):
+    @analytics_ns.expect(portfolio_parser)
+    def get(self):
+        """Portfolio valuation, allocation and concentration recomputed from holdings"""
+        args = portfolio_parser.parse_args()
+        investments = filter_data_by_permissions('investments')
+        if not investments or not investments.get('holdings'):
+            return {"error": "No investment data available"}, 400
         
+        engine = get_portfolio_engine()
+        try:
+            allocation = engine.allocation(args['group_by'])
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        
+        summary = engine.summary()
         return {
-            "anomalies": detect_spending_anomalies(transactions),
-            "forecast": forecast_future_spending(transactions, 3),
-            "trends": analyze_spending_trends(transactions),
-            "budget_recommendations": generate_budget_recommendations(transactions),
-            "summary": calculate_spending_summary(transactions)
+            "portfolio": summary['portfolio'],
+            "holdings": summary['holdings'],
+            "allocation": allocation,
+            "concentration": engine.concentration()
         }
 
-# Query AI Resource
-@query_ns.route('')
-class AIQuery(Resource):
-    @query_ns.expect(query_model)
+@analytics_ns.route('/portfolio/rebalance')
+class PortfolioRebalance(Resource):
+    @analytics_ns.expect(rebalance_model)
     def post(self):
+        """Drift against a target allocation and the trades to close it"""
         data = request.json
-        if not data or 'query' not in data:
-            return {"error": "Query is required"}, 400
+        if not data or not data.get('target_allocation'):
+            return {"error": "target_allocation is required"}, 400
         
-        user_query = data['query'].strip()
-        if not user_query:
-            return {"error": "Query cannot be empty"}, 400
+        investments = filter_data_by_permissions('investments')
+        if not investments or not investments.get('holdings'):
+            return {"error": "No investment data available"}, 400
         
-        conversation_history = get_conversation_context()
-        perms = session.get('permissions', default_permissions)
-        context_data = {k: financial_data[k] for k, v in perms.items() if v and k in financial_data}
+        engine = get_portfolio_engine()
+        group_by = data.get('group_by', 'type')
+        try:
+            drift = engine.drift(data['target_allocation'], group_by)
+            rebalance = engine.rebalance_trades(data['target_allocation'], group_by,
+                                                min_trade=float(data.get('min_trade', 0)))
+        except (ValueError, TypeError) as e:
+            return {"error": str(e)}, 400
         
-        if model is None:
-            return {"error": "AI service not available. Please check GEMINI_API_KEY configuration and available models."}, 503
+        return {
+            "group_by": group_by,
+            "drift": drift,
+            "trades": rebalance['trades'],
+            "unallocated": rebalance['unallocated'],
+            "turnover": rebalance['turnover']
+        }
+
+@analytics_ns.route('/debt-payoff')
+class DebtPayoff(Resource):
+    @analytics_ns.expect(debt_payoff_parser)
+    def get(self):
+        """Debt payoff schedules across a sweep of extra-payment budgets"""
+        args = debt_payoff_parser.parse_args()
+        liabilities = filter_data_by_permissions('liabilities')
+        if not liabilities:
+            return {"error": "No liability data available"}, 400
         
-        # Check cache first
-        cache_key = get_cache_key(user_query, list(context_data.keys()))
-        cached_response = get_cached_response(cache_key)
+        try:
+            extra_payments = [float(x) for x in args['extra'].split(',') if x.strip()]
+        except ValueError:
+            return {"error": "extra must be a comma-separated list of amounts"}, 400
+        custom_order = [x.strip() for x in args['order'].split(',') if x.strip()] if args.get('order') else None
         
-        if cached_response:
-            ai_response = cached_response
-        else:
-            # Generate prompt
-            prompt = generate_ai_prompt(user_query, context_data, conversation_history)
-            
-            try:
-                ai_response = make_ai_request_with_retry(prompt)
-                # Cache the successful response
-                cache_response(cache_key, ai_response)
-            except Exception as e:
-                logger.error(f"Gemini API error: {e}")
-                # Provide more specific error messages based on the error type
-                if "404" in str(e) and "not found" in str(e):
-                    ai_response = f"AI model configuration error: The selected model is not available. Please check your API configuration."
-                elif "403" in str(e):
-                    ai_response = f"AI service access denied: Please verify your API key permissions."
-                elif "429" in str(e):
-                    ai_response = f"AI service rate limit exceeded. Please wait a few minutes before trying again."
-                else:
-                    ai_response = f"Technical difficulties with AI service: {e}"
+        try:
+            return get_debt_payoff(args['strategy'], extra_payments, custom_order, args['schedule'])
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+@analytics_ns.route('/epf-projection')
+class EPFProjection(Resource):
+    @analytics_ns.expect(epf_projection_parser)
+    def get(self):
+        """EPF balance growth across interest, contribution and salary-growth scenarios"""
+        args = epf_projection_parser.parse_args()
+        if not filter_data_by_permissions('epf'):
+            return {"error": "No EPF data available"}, 400
         
-        add_to_conversation_context(user_query, ai_response)
-        logger.info(f"AI Query processed - User: {user_query[:50]}...")
+        try:
+            return get_epf_projection(
+                args['years'],
+                parse_float_list(args['interest_rates'], 'interest_rates'),
+                parse_float_list(args.get('contribution_rates'), 'contribution_rates'),
+                parse_float_list(args['salary_growth'], 'salary_growth'),
+                args.get('balance'), args.get('monthly_salary'), args['schedule']
+            )
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+@analytics_ns.route('/credit-projection')
+class CreditScoreProjection(Resource):
+    @analytics_ns.expect(credit_projection_parser)
+    def get(self):
+        """Credit-score trend from the score history at current and target utilization"""
+        args = credit_projection_parser.parse_args()
+        if not filter_data_by_permissions('credit_score'):
+            return {"error": "No credit score data available"}, 400
         
-        return {
-            "response": ai_response,
-            "timestamp": datetime.now().isoformat(),
-            "context_used": list(context_data.keys())
+        try:
+            targets = parse_float_list(args['utilization'], 'utilization')
+            return get_credit_projection(args['months'], targets, bool(filter_data_by_permissions('liabilities')),
+                                         args['schedule'], args.get('current_utilization'))
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+@analytics_ns.route('/rollup')
+class SpendingRollup(Resource):
+    @analytics_ns.expect(rollup_parser)
+    def get(self):
+        """Slice the precomputed day/week/month rollups by category, account and sign"""
+        args = rollup_parser.parse_args()
+        transactions_data = filter_data_by_permissions('transactions')
+        if not transactions_data or 'transactions' not in transactions_data:
+            return {"error": "No transaction data available"}, 400
+        
+        def split(value):
+            return [v.strip() for v in value.split(',') if v.strip()] if value else []
+        
+        filters = {
+            "category": split(args.get('category')),
+            "account": split(args.get('account')),
+            "sign": split(args.get('sign'))
         }
+        try:
+            return rollup_cube.query(args['grain'], args.get('start'), args.get('end'),
+                                     split(args['group_by']), args['by_time'], filters)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+# Query AI Resource
+@query_ns.route('')
+class AIQuery(Resource):
+    @query_ns.expect(query_model)
+    def post(self):
+        response, pending = prepare_ai_query(request.json)
+        if response is not None:
+            return response
+        
+        try:
+            ai_response = make_ai_request_with_retry(pending['prompt'], pending['user_query'])
+        except Exception as e:
+            return complete_ai_query(pending, error=e)
+        return complete_ai_query(pending, ai_response)
+
+@query_ns.route('/quota')
+class QuotaStatus(Resource):
+    def get(self):
+        """Quota governor limits, queue depth and wait-time metrics per model"""
+        with quota_lock:
+            governors = list(quota_governors.values())
+        return {"governors": [governor.metrics() for governor in governors]}
+
+@query_ns.route('/router')
+class RouterStatus(Resource):
+    def get(self):
+        """Hit rate of the local intent router"""
+        return intent_router.metrics()
 
 # Session Management Resource
 @session_ns.route('/init')
@@ -795,6 +1684,8 @@ class ClearCache(Resource):
         global response_cache
         cache_size = len(response_cache)
         response_cache.clear()
+        if response_store is not None:
+            response_store.clear()
         logger.info(f"Response cache cleared ({cache_size} entries removed)")
         return {"message": f"Response cache cleared successfully ({cache_size} entries removed)"}
 
@@ -804,9 +1695,20 @@ class CacheStatus(Resource):
         return {
             "cache_size": len(response_cache),
             "cache_duration_minutes": CACHE_DURATION // 60,
+            "persisted_entries": response_store.count() if response_store is not None else 0,
             "cached_queries": list(response_cache.keys())[:10]  # Show first 10 for debugging
         }
 
+@health_ns.route('/profiles')
+class ProfileFiles(Resource):
+    def get(self):
+        """Profiler counters and the captured profile files (admin token required)"""
+        if request_profiler is None:
+            return {"error": "Profiling is disabled"}, 404
+        if not request_profiler.is_admin(request.headers.get(PROFILE_HEADER)):
+            return {"error": "Admin token required"}, 403
+        return {**request_profiler.metrics(), "files": request_profiler.list_files()}
+
 # Health Check Resource
 @health_ns.route('')
 class HealthCheck(Resource):
@@ -825,6 +1727,7 @@ class HealthCheck(Resource):
                 "status": "healthy",
                 "timestamp": datetime.now().isoformat(),
                 "ai_service": model_info,
+                "model_pool": model_pool.status() if model_pool else [],
                 "data_files_loaded": len([k for k, v in financial_data.items() if v]),
                 "version": "1.0.0",
                 "enhanced_analytics": "enabled"
@@ -879,9 +1782,9 @@ def generate_ai_prompt(user_query, context_data, conversation_history):
                 # ADD ENHANCED ANALYTICS
                 try:
                     # Add analytics insights
-                    anomalies = detect_spending_anomalies(transactions)
-                    trends = analyze_spending_trends(transactions)
-                    budget_recs = generate_budget_recommendations(transactions)
+                    anomalies = detect_spending_anomalies(storage)
+                    trends = analyze_spending_trends(storage)
+                    budget_recs = generate_budget_recommendations(storage)
                     
                     financial_summary += f"\nAdvanced Insights:\n"
                     if anomalies.get('total_anomalies', 0) > 0:
@@ -903,15 +1806,44 @@ def generate_ai_prompt(user_query, context_data, conversation_history):
 
         if 'investments' in context_data and context_data['investments']:
             investments = context_data['investments']
-            if 'portfolio' in investments:
+            portfolio = None
+            if investments.get('holdings'):
+                engine = get_portfolio_engine()
+                portfolio = engine.summary()['portfolio']
+                concentration = engine.concentration(top_n=1)
+            elif 'portfolio' in investments:
                 portfolio = investments['portfolio']
+                concentration = None
+            
+            if portfolio:
                 financial_summary += f"Investment Portfolio Value: ${portfolio.get('total_value', 0):,.2f}\n"
                 financial_summary += f"Total Gain/Loss: ${portfolio.get('total_gain_loss', 0):,.2f} ({portfolio.get('total_gain_loss_percentage', 0):.1f}%)\n"
+                if concentration and concentration['top_holdings']:
+                    top = concentration['top_holdings'][0]
+                    financial_summary += f"Largest Holding: {top['name']} ({top['percentage']:.1f}% of portfolio)\n"
 
         if 'credit_score' in context_data and context_data['credit_score']:
             credit_info = context_data['credit_score']
             if 'current_score' in credit_info:
                 financial_summary += f"Credit Score: {credit_info['current_score']} ({credit_info.get('score_range', 'Unknown')})\n"
+                try:
+                    credit_projection = get_credit_projection(12, (), bool(context_data.get('liabilities')))
+                    current = credit_projection['scenarios'][0]
+                    financial_summary += f"- Score trend: {credit_projection['trend_points_per_month']:+.1f} points/month; projected {current['projected_score']} in 12 months\n"
+                    if credit_projection['current_utilization'] is not None:
+                        financial_summary += f"- Credit utilization: {credit_projection['current_utilization'] * 100:.1f}%\n"
+                except ValueError as e:
+                    logger.warning(f"Could not project credit score: {e}")
+
+        if 'epf' in context_data and context_data['epf']:
+            try:
+                epf_projection = get_epf_projection(20)
+                scenario = epf_projection['scenarios'][0]
+                financial_summary += f"EPF Balance: ${epf_projection['starting_balance']:,.2f}\n"
+                financial_summary += f"- Projected EPF balance in 20 years: ${scenario['final_balance']:,.2f} at {scenario['interest_rate'] * 100:.2f}% interest\n"
+            except ValueError:
+                # epf.json without balance and salary figures has nothing to project
+                pass
 
     prompt = f"""You are a professional financial advisor AI assistant. You have access to the user's financial data and can provide personalized financial advice, analysis, and insights.
 
@@ -950,6 +1882,34 @@ Please provide your response in bullet point format:"""
 
     return prompt
 
+def prewarm_response_cache(path):
+    """Answer common queries from a file ahead of traffic so they are served from cache"""
+    if model_pool is None:
+        logger.warning("Skipping cache pre-warm: AI service not available")
+        return 0
+    
+    with open(path, 'r') as f:
+        queries = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    
+    context_data = {k: financial_data[k] for k, v in default_permissions.items() if v and k in financial_data}
+    warmed = 0
+    for user_query in queries:
+        cache_key = get_cache_key(user_query, list(context_data.keys()))
+        if get_cached_response(cache_key) or intent_router.route(user_query):
+            continue  # already cached, or answered locally without Gemini
+        try:
+            prompt = generate_ai_prompt(user_query, context_data, [])
+            ai_response = make_ai_request_with_retry(prompt, user_query, priority=PRIORITY_BACKGROUND)
+        except Exception as e:
+            logger.warning(f"Pre-warm failed for '{user_query[:50]}': {e}")
+            continue
+        if ai_response != NO_AI_RESPONSE:
+            cache_response(cache_key, ai_response, list(context_data.keys()))
+            warmed += 1
+    
+    logger.info(f"Pre-warmed response cache with {warmed} of {len(queries)} queries")
+    return warmed
+
 # Register namespaces
 api.add_namespace(perm_ns, path='/permissions')
 api.add_namespace(data_ns, path='/data')
@@ -959,6 +1919,24 @@ api.add_namespace(conv_ns, path='/conversation')
 api.add_namespace(health_ns, path='/health')
 api.add_namespace(analytics_ns, path='/analytics')
 
+def start_background_tasks():
+    """Start the data refresher and cache compactor, then pre-warm the response cache"""
+    if AUTO_REFRESH_DATA:
+        start_data_refresher()
+    if response_store is not None:
+        start_cache_compactor()
+    if CACHE_PREWARM_FILE:
+        prewarm_response_cache(CACHE_PREWARM_FILE)
+
+def stop_background_tasks():
+    """Stop the background threads and close the persistent response cache"""
+    data_refresher_stop.set()
+    cache_compactor_stop.set()
+    if response_store is not None:
+        response_store.close()
+    logger.info("Background tasks stopped")
+
 if __name__ == '__main__':
     logger.info("Starting AI Finance Assistant Backend with Enhanced Analytics...")
+    start_background_tasks()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
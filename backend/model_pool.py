@@ -0,0 +1,335 @@
+"""
+Pool of Gemini model handles with complexity routing, latency tracking and circuit breaking
+"""
+
+import asyncio
+import re
+import threading
+import time
+
+from quota import QuotaExceeded, estimate_tokens, PRIORITY_INTERACTIVE
+
+# Prompts longer than this, or queries matching these words, go to the heavy tier first
+HEAVY_PROMPT_CHARS = 6000
+HEAVY_QUERY_PATTERN = re.compile(
+    r'\b(plan|strategy|strategies|compare|comparison|why|should i|analy[sz]e|forecast|project|'
+    r'optimi[sz]e|retire|retirement|scenario|explain|pros and cons)\b',
+    re.IGNORECASE
+)
+# Wording (in the message or exception class name) of failures that may clear up on another attempt
+TRANSIENT_ERROR_PATTERN = re.compile(
+    r'\b(429|500|502|503|504)\b|rate limit|resource ?exhausted|time ?out|timed out|deadline ?exceeded|'
+    r'unavailable|internal ?server ?error|connection',
+    re.IGNORECASE
+)
+
+
+class ModelUnavailable(Exception):
+    """Raised when every model in the pool has an open circuit"""
+
+
+def is_rate_limit_error(error):
+    error_str = str(error)
+    return "429" in error_str or "rate limit" in error_str.lower()
+
+
+def is_transient_error(error):
+    """Rate limits, server errors, timeouts and connection failures.
+
+    Only these count against a model's circuit and fail over to another
+    model; anything else (bad request, blocked prompt, bad API key) would
+    fail the same way everywhere and is raised to the caller.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # google.api_core exceptions carry their HTTP status as `code`
+    code = getattr(error, 'code', None)
+    if isinstance(code, int):
+        return code == 429 or code >= 500
+    return bool(TRANSIENT_ERROR_PATTERN.search(f"{type(error).__name__} {error}"))
+
+
+def model_tier(model_name):
+    """Flash models serve light queries; everything else is treated as heavy"""
+    return 'light' if 'flash' in (model_name or '') else 'heavy'
+
+
+class ModelStats:
+    """Moving averages and circuit breaker state for one model"""
+
+    def __init__(self, name, preference):
+        self.name = name
+        self.preference = preference
+        self.tier = model_tier(name)
+        self.latency = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.state = 'closed'
+        self.opened_at = None
+        self.trial_started = None
+
+    def to_dict(self):
+        return {
+            "model": self.name,
+            "tier": self.tier,
+            "state": self.state,
+            "avg_latency_seconds": round(self.latency, 3) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "calls": self.calls,
+            "failures": self.failures
+        }
+
+
+class ModelPool:
+    """Routes prompts across several GenerativeModel-like handles.
+
+    Any object with generate_content(prompt) works as a handle, which keeps
+    the pool testable offline with ScriptedModel. Each model tracks an
+    exponentially weighted latency and error rate over transient failures
+    (see is_transient_error); other errors are raised at once. A model
+    whose circuit opens (too many consecutive failures or a high error rate) is skipped
+    until its cooldown passes, then gets a single half-open trial: one
+    request claims it and the others keep using the remaining models until
+    that trial is recorded.
+    """
+
+    def __init__(self, models, governor_for=None, alpha=0.3, failure_threshold=3,
+                 error_rate_threshold=0.5, cooldown=30.0, failover_wait=1.0, clock=time.monotonic):
+        self.handles = dict(models)
+        self.stats = {name: ModelStats(name, i) for i, (name, _) in enumerate(models)}
+        self.governor_for = governor_for
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.cooldown = cooldown
+        self.failover_wait = failover_wait
+        self.clock = clock
+        self.lock = threading.Lock()
+
+    @property
+    def primary(self):
+        return next(iter(self.handles.values()), None)
+
+    def classify(self, prompt, query=None):
+        """'heavy' for long prompts or analytical questions, otherwise 'light'"""
+        if len(prompt) > HEAVY_PROMPT_CHARS:
+            return 'heavy'
+        if query and (len(query) > 200 or HEAVY_QUERY_PATTERN.search(query)):
+            return 'heavy'
+        return 'light'
+
+    def _available(self, stats, now):
+        if stats.state == 'closed':
+            return True
+        if stats.state == 'open':
+            if now - stats.opened_at < self.cooldown:
+                return False
+            stats.state = 'half_open'
+            stats.trial_started = None
+        # A trial that never reported back (e.g. a cancelled request) expires after a cooldown
+        return stats.trial_started is None or now - stats.trial_started >= self.cooldown
+
+    def _claim(self, name):
+        """Take the half-open trial slot for name; False if the model is not usable right now"""
+        with self.lock:
+            stats = self.stats[name]
+            now = self.clock()
+            if not self._available(stats, now):
+                return False
+            if stats.state == 'half_open':
+                stats.trial_started = now
+            return True
+
+    def _release(self, name):
+        """Give back a claimed trial slot without recording a call"""
+        with self.lock:
+            self.stats[name].trial_started = None
+
+    def _score(self, stats):
+        # Unmeasured models rank by configured preference; measured ones by error-weighted latency
+        latency = stats.latency if stats.latency is not None else 0.0
+        return (latency * (1 + 3 * stats.error_rate), stats.preference)
+
+    def candidates(self, complexity='light'):
+        """Models to try, best first: preferred tier, then the rest"""
+        with self.lock:
+            now = self.clock()
+            usable = [s for s in self.stats.values() if self._available(s, now)]
+            usable.sort(key=lambda s: (s.tier != complexity, s.state == 'half_open') + self._score(s))
+            return [s.name for s in usable]
+
+    def record(self, name, latency, ok):
+        with self.lock:
+            stats = self.stats[name]
+            stats.trial_started = None
+            stats.calls += 1
+            stats.error_rate = (1 - self.alpha) * stats.error_rate + self.alpha * (0.0 if ok else 1.0)
+            if ok:
+                stats.latency = latency if stats.latency is None else (1 - self.alpha) * stats.latency + self.alpha * latency
+                stats.consecutive_failures = 0
+                stats.state = 'closed'
+                return
+
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            tripped = (stats.consecutive_failures >= self.failure_threshold or
+                       (stats.calls >= self.failure_threshold and stats.error_rate >= self.error_rate_threshold))
+            if stats.state == 'half_open' or tripped:
+                stats.state = 'open'
+                stats.opened_at = self.clock()
+
+    def _next_model(self, complexity, tried, queue_timeout):
+        """(name, governor, quota wait budget) for the next attempt, or None when no model is usable"""
+        candidates = self.candidates(complexity)
+        untried = [name for name in candidates if name not in tried]
+        # Another request may claim a half-open trial between listing and claiming
+        name = next((name for name in untried or candidates if self._claim(name)), None)
+        if name is None:
+            return None
+        tried.add(name)
+        governor = self.governor_for(name) if self.governor_for else None
+        # Only the last resort waits the full queue timeout; others fail over quickly
+        wait_budget = queue_timeout if len(untried) <= 1 else self.failover_wait
+        return name, governor, wait_budget
+
+    def _failed(self, name, governor, error, elapsed, attempt):
+        self.record(name, elapsed, ok=False)
+        if governor is not None and is_rate_limit_error(error):
+            governor.penalize(retry_after=2 ** attempt)
+
+    def _succeeded(self, name, governor, response, elapsed, estimated):
+        self.record(name, elapsed, ok=True)
+        if governor is not None:
+            usage = getattr(response, 'usage_metadata', None)
+            governor.settle(estimated, getattr(usage, 'total_token_count', None))
+
+    @staticmethod
+    def _exhausted(last_error, max_attempts):
+        if last_error is None:
+            return ModelUnavailable("All AI models are temporarily unavailable")
+        if is_rate_limit_error(last_error):
+            return QuotaExceeded("AI service rate limit exceeded after retries", retry_after=2 ** max_attempts)
+        return last_error
+
+    def generate(self, prompt, query=None, priority=PRIORITY_INTERACTIVE, max_attempts=3, queue_timeout=20.0):
+        """Return (response, model_name), failing over across models on errors"""
+        complexity = self.classify(prompt, query)
+        estimated = estimate_tokens(prompt)
+        tried = set()
+        last_error = None
+
+        for attempt in range(max_attempts):
+            selected = self._next_model(complexity, tried, queue_timeout)
+            if selected is None:
+                break
+            name, governor, wait_budget = selected
+            if governor is not None:
+                try:
+                    governor.acquire(estimated, priority, timeout=wait_budget)
+                except QuotaExceeded as e:
+                    self._release(name)
+                    last_error = e
+                    continue
+
+            start = self.clock()
+            try:
+                response = self.handles[name].generate_content(prompt)
+            except Exception as e:
+                if not is_transient_error(e):
+                    self._release(name)
+                    raise
+                self._failed(name, governor, e, self.clock() - start, attempt)
+                last_error = e
+                continue
+
+            self._succeeded(name, governor, response, self.clock() - start, estimated)
+            return response, name
+
+        raise self._exhausted(last_error, max_attempts)
+
+    async def generate_async(self, prompt, query=None, priority=PRIORITY_INTERACTIVE, max_attempts=3,
+                             queue_timeout=20.0):
+        """generate() for event-loop callers: quota waits and model calls do not hold a thread.
+
+        Handles with generate_content_async (GenerativeModel, ScriptedModel)
+        are awaited directly; others run in the loop's default executor.
+        """
+        complexity = self.classify(prompt, query)
+        estimated = estimate_tokens(prompt)
+        tried = set()
+        last_error = None
+
+        for attempt in range(max_attempts):
+            selected = self._next_model(complexity, tried, queue_timeout)
+            if selected is None:
+                break
+            name, governor, wait_budget = selected
+            if governor is not None:
+                try:
+                    await governor.acquire_async(estimated, priority, timeout=wait_budget)
+                except QuotaExceeded as e:
+                    self._release(name)
+                    last_error = e
+                    continue
+
+            handle = self.handles[name]
+            start = self.clock()
+            try:
+                if hasattr(handle, 'generate_content_async'):
+                    response = await handle.generate_content_async(prompt)
+                else:
+                    response = await asyncio.get_running_loop().run_in_executor(None, handle.generate_content, prompt)
+            except Exception as e:
+                if not is_transient_error(e):
+                    self._release(name)
+                    raise
+                self._failed(name, governor, e, self.clock() - start, attempt)
+                last_error = e
+                continue
+
+            self._succeeded(name, governor, response, self.clock() - start, estimated)
+            return response, name
+
+        raise self._exhausted(last_error, max_attempts)
+
+    def status(self):
+        with self.lock:
+            return [stats.to_dict() for stats in self.stats.values()]
+
+
+class ScriptedModel:
+    """Offline stand-in for GenerativeModel with scripted latency and failures.
+
+    script is a list of steps; each step is a latency in seconds or an
+    exception instance to raise. The last step repeats once the script runs out.
+    """
+
+    def __init__(self, name, script=(0.0,), text="• Scripted response", sleep=time.sleep):
+        self._model_name = name
+        self.script = list(script)
+        self.text = text
+        self.sleep = sleep
+        self.calls = 0
+
+    def _next_step(self):
+        step = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        if isinstance(step, BaseException):
+            raise step
+        return step
+
+    def generate_content(self, prompt):
+        self.sleep(self._next_step())
+        return _ScriptedResponse(self.text, estimate_tokens(prompt))
+
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(self._next_step())
+        return _ScriptedResponse(self.text, estimate_tokens(prompt))
+
+
+class _ScriptedResponse:
+    def __init__(self, text, total_tokens):
+        self.text = text
+        self.usage_metadata = type('UsageMetadata', (), {'total_token_count': total_tokens})()
@@ -0,0 +1,289 @@
+"""
+Vectorized portfolio analytics for the investments.json holdings
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+
+
+def _normalize_weights(target_allocation):
+    """Accept targets as fractions (0.6) or percentages (60) and return fractions"""
+    if not isinstance(target_allocation, dict):
+        raise ValueError("Target allocation must be an object mapping groups to weights")
+    weights = {}
+    for key, value in target_allocation.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not np.isfinite(value):
+            raise ValueError(f"Target weight for '{key}' must be a finite number")
+        if value < 0:
+            raise ValueError(f"Target weight for '{key}' must not be negative")
+        weights[key] = float(value)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("Target allocation must contain positive weights")
+    return {key: value / total for key, value in weights.items()}
+
+
+class PortfolioEngine:
+    """NumPy-backed portfolio that recomputes every figure from holdings and prices.
+
+    Holdings are stored column-wise so valuation, allocation and rebalancing are
+    whole-array operations. Price updates only touch the holdings whose price
+    actually changed and adjust the running total by the delta.
+    """
+
+    GROUP_FIELDS = ('type', 'symbol', 'user_id')
+
+    def __init__(self, holdings=None):
+        self.lock = threading.RLock()
+        self.version = 0
+        self.load_holdings(holdings or [])
+
+    def load_holdings(self, holdings):
+        """(Re)build the column arrays from a list of holding dicts"""
+        with self.lock:
+            self.ids = [h.get('id') for h in holdings]
+            self.names = [h.get('name', h.get('symbol', '')) for h in holdings]
+            self.keys = {
+                'type': np.array([h.get('type', 'other') for h in holdings], dtype=object),
+                'symbol': np.array([h.get('symbol') or h.get('id') or '' for h in holdings], dtype=object),
+                'user_id': np.array([h.get('user_id', 'default') for h in holdings], dtype=object),
+            }
+            self.shares = np.array([float(h.get('shares', 0) or 0) for h in holdings], dtype=float)
+            self.prices = np.array([float(h.get('current_price', 0) or 0) for h in holdings], dtype=float)
+            self.cost_basis = np.array([float(h.get('cost_basis', 0) or 0) for h in holdings], dtype=float)
+            self.values = self.shares * self.prices
+
+            # Holdings that lack a price but carry a stored value keep that value
+            missing_price = (self.prices == 0) & (self.shares > 0)
+            if missing_price.any():
+                stored = np.array([float(h.get('total_value', 0) or 0) for h in holdings], dtype=float)
+                self.values[missing_price] = stored[missing_price]
+                self.prices[missing_price] = stored[missing_price] / self.shares[missing_price]
+
+            self.symbol_index = {}
+            for i, symbol in enumerate(self.keys['symbol']):
+                self.symbol_index.setdefault(symbol, []).append(i)
+            self.symbol_index = {s: np.array(idx, dtype=np.intp) for s, idx in self.symbol_index.items()}
+
+            self.total_value = float(self.values.sum())
+            self.version += 1
+
+    def apply_prices(self, price_map):
+        """Revalue holdings from a {symbol: price} map and return how many changed"""
+        with self.lock:
+            changed_idx = []
+            changed_prices = []
+            for symbol, price in price_map.items():
+                idx = self.symbol_index.get(symbol)
+                if idx is None:
+                    continue
+                price = float(price)
+                stale = idx[self.prices[idx] != price]
+                if stale.size:
+                    changed_idx.append(stale)
+                    changed_prices.append(np.full(stale.size, price))
+
+            if not changed_idx:
+                return 0
+
+            idx = np.concatenate(changed_idx)
+            new_prices = np.concatenate(changed_prices)
+            new_values = self.shares[idx] * new_prices
+            self.total_value += float((new_values - self.values[idx]).sum())
+            self.prices[idx] = new_prices
+            self.values[idx] = new_values
+            self.version += 1
+            return int(idx.size)
+
+    def _mask(self, user_id=None):
+        if user_id is None:
+            return slice(None)
+        return self.keys['user_id'] == user_id
+
+    def summary(self, user_id=None):
+        """Portfolio totals plus per-holding figures, matching investments.json"""
+        with self.lock:
+            mask = self._mask(user_id)
+            values = self.values[mask]
+            cost = self.cost_basis[mask]
+            total_value = self.total_value if user_id is None else float(values.sum())
+            total_invested = float(cost.sum())
+            gain = values - cost
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                gain_pct = np.where(cost > 0, gain / cost * 100, 0.0)
+                allocation = values / total_value * 100 if total_value else np.zeros_like(values)
+
+            positions = np.arange(len(self.ids))[mask]
+            holdings = []
+            for row, i in enumerate(positions):
+                holdings.append({
+                    "id": self.ids[i],
+                    "name": self.names[i],
+                    "symbol": self.keys['symbol'][i],
+                    "type": self.keys['type'][i],
+                    "shares": float(self.shares[i]),
+                    "current_price": round(float(self.prices[i]), 2),
+                    "total_value": round(float(values[row]), 2),
+                    "cost_basis": round(float(cost[row]), 2),
+                    "gain_loss": round(float(gain[row]), 2),
+                    "gain_loss_percentage": round(float(gain_pct[row]), 2),
+                    "allocation_percentage": round(float(allocation[row]), 2)
+                })
+
+            total_gain = total_value - total_invested
+            return {
+                "portfolio": {
+                    "total_value": round(total_value, 2),
+                    "total_invested": round(total_invested, 2),
+                    "total_gain_loss": round(total_gain, 2),
+                    "total_gain_loss_percentage": round(total_gain / total_invested * 100, 2) if total_invested else 0.0
+                },
+                "holdings": holdings
+            }
+
+    def _grouped(self, group_by, user_id=None):
+        if group_by not in self.GROUP_FIELDS:
+            raise ValueError(f"group_by must be one of {', '.join(self.GROUP_FIELDS)}")
+        mask = self._mask(user_id)
+        keys = self.keys[group_by][mask]
+        values = self.values[mask]
+        groups, inverse = np.unique(keys.astype(str), return_inverse=True)
+        group_values = np.bincount(inverse, weights=values, minlength=len(groups))
+        return mask, groups, inverse, values, group_values
+
+    def allocation(self, group_by='type', user_id=None):
+        """Current value and weight per group"""
+        with self.lock:
+            _, groups, _, values, group_values = self._grouped(group_by, user_id)
+            total = float(values.sum())
+            return {
+                str(g): {
+                    "value": round(float(v), 2),
+                    "percentage": round(float(v) / total * 100, 2) if total else 0.0
+                }
+                for g, v in zip(groups, group_values)
+            }
+
+    def concentration(self, user_id=None, top_n=5):
+        """Herfindahl index, effective number of positions and largest holdings"""
+        with self.lock:
+            mask = self._mask(user_id)
+            values = self.values[mask]
+            total = float(values.sum())
+            if total <= 0:
+                return {"hhi": 0.0, "effective_holdings": 0.0, "largest_position_percentage": 0.0, "top_holdings": []}
+
+            weights = values / total
+            hhi = float(np.square(weights).sum())
+            positions = np.arange(len(self.ids))[mask]
+            order = np.argsort(weights)[::-1][:top_n]
+            return {
+                "hhi": round(hhi, 4),
+                "effective_holdings": round(1 / hhi, 2),
+                "largest_position_percentage": round(float(weights[order[0]]) * 100, 2),
+                "top_holdings": [
+                    {
+                        "id": self.ids[positions[i]],
+                        "name": self.names[positions[i]],
+                        "percentage": round(float(weights[i]) * 100, 2)
+                    }
+                    for i in order
+                ]
+            }
+
+    def drift(self, target_allocation, group_by='type', user_id=None):
+        """Compare current group weights against a target allocation"""
+        targets = _normalize_weights(target_allocation)
+        with self.lock:
+            _, groups, _, values, group_values = self._grouped(group_by, user_id)
+            total = float(values.sum())
+            current = {str(g): float(v) for g, v in zip(groups, group_values)}
+
+        result = {}
+        for group in sorted(set(current) | set(targets)):
+            current_value = current.get(group, 0.0)
+            current_pct = current_value / total * 100 if total else 0.0
+            target_pct = targets.get(group, 0.0) * 100
+            result[group] = {
+                "current_value": round(current_value, 2),
+                "target_value": round(total * targets.get(group, 0.0), 2),
+                "current_percentage": round(current_pct, 2),
+                "target_percentage": round(target_pct, 2),
+                "drift_percentage": round(current_pct - target_pct, 2)
+            }
+        return result
+
+    def rebalance_trades(self, target_allocation, group_by='type', user_id=None, min_trade=0.0):
+        """Trades that move the portfolio onto the target allocation.
+
+        Each group's buy/sell amount is spread across its holdings in proportion
+        to their current value. Target groups with no holdings are reported as
+        unallocated cash that still needs an instrument.
+        """
+        targets = _normalize_weights(target_allocation)
+        with self.lock:
+            mask, groups, inverse, values, group_values = self._grouped(group_by, user_id)
+            total = float(values.sum())
+            group_targets = np.array([targets.get(str(g), 0.0) * total for g in groups])
+            group_trades = group_targets - group_values
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                share_of_group = np.where(group_values[inverse] > 0, values / group_values[inverse], 0.0)
+            trade_values = group_trades[inverse] * share_of_group
+            prices = self.prices[mask]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                trade_shares = np.where(prices > 0, trade_values / prices, 0.0)
+
+            positions = np.arange(len(self.ids))[mask]
+            trades = []
+            for row in np.argsort(-np.abs(trade_values)):
+                amount = float(trade_values[row])
+                if abs(amount) <= min_trade or abs(amount) < 0.005:
+                    continue
+                i = positions[row]
+                trades.append({
+                    "id": self.ids[i],
+                    "symbol": self.keys['symbol'][i],
+                    group_by: str(groups[inverse[row]]),
+                    "action": "buy" if amount > 0 else "sell",
+                    "amount": round(abs(amount), 2),
+                    "shares": round(abs(float(trade_shares[row])), 4)
+                })
+
+        unallocated = {
+            group: round(weight * total, 2)
+            for group, weight in targets.items()
+            if group not in set(str(g) for g in groups) and weight > 0
+        }
+        return {
+            "trades": trades,
+            "unallocated": unallocated,
+            "turnover": round(sum(t["amount"] for t in trades), 2)
+        }
+
+
+class PriceFeed:
+    """Local JSON price file that is re-read only when it changes on disk"""
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+
+    def poll(self):
+        """Return the {symbol: price} map if the file changed since last poll"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return None
+        if mtime == self.mtime:
+            return None
+        self.mtime = mtime
+
+        with open(self.path, 'r') as f:
+            data = json.load(f)
+        prices = data.get('prices', data) if isinstance(data, dict) else {}
+        return {symbol: price for symbol, price in prices.items() if isinstance(price, (int, float))}
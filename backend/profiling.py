@@ -0,0 +1,241 @@
+"""
+Opt-in per-request profiling: cProfile dumps on demand and sampled stacks for slow requests
+"""
+
+import cProfile
+import hmac
+import itertools
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_PARAM = '__profile'
+# WSGI environ flag for requests served in several request contexts (ASGI /query);
+# their slow capture is recorded once for the whole request with record_phases()
+SPLIT_REQUEST_KEY = 'profiling.split_request'
+
+
+def collapse_stack(frame, limit=128):
+    """Root-first 'module:function;...' line in the collapsed-stack (flame graph) format"""
+    names = []
+    while frame is not None and len(names) < limit:
+        code = frame.f_code
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        names.append(f"{module}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """Single background thread sampling the stacks of tracked request threads.
+
+    Cost is one sys._current_frames() call per interval while any request
+    is tracked, regardless of how many requests are in flight, and each
+    request keeps at most max_samples samples.
+    """
+
+    def __init__(self, interval=0.01, max_samples=5000):
+        self.interval = interval
+        self.max_samples = max_samples
+        self.tracked = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def track(self, thread_id):
+        counts = Counter()
+        with self.lock:
+            self.tracked[thread_id] = counts
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self.thread.start()
+        self.wakeup.set()
+        return counts
+
+    def untrack(self, thread_id):
+        with self.lock:
+            return self.tracked.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            with self.lock:
+                idle = not self.tracked
+            if idle:
+                # Sleep until a request is tracked instead of polling
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id, counts in self.tracked.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None and sum(counts.values()) < self.max_samples:
+                        counts[collapse_stack(frame)] += 1
+
+
+class RequestProfiler:
+    """Flask hooks that profile individual requests and write the results to output_dir.
+
+    A request is profiled with cProfile (written as a .prof pstats file) when
+    it carries the admin token in the X-Profile header or __profile query
+    parameter, or when it is picked by sample_rate. Independently, when
+    slow_threshold is set every request's thread is stack-sampled and the
+    collapsed stacks are written for requests slower than the threshold.
+    Only one cProfile session runs at a time; other requests are skipped.
+
+    Requests split across request contexts with an awaited step in between
+    (ASGI /query) are not stack-sampled per context; the ASGI layer times
+    the whole request and record_phases() writes the phases, including the
+    model wait, when it is slow. cProfile still covers only the in-thread parts.
+    """
+
+    def __init__(self, output_dir, admin_token=None, sample_rate=0.0, slow_threshold=0.0,
+                 sample_interval=0.01, max_files=200):
+        self.output_dir = output_dir
+        self.admin_token = admin_token
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.max_files = max_files
+        self.sampler = StackSampler(sample_interval) if slow_threshold > 0 else None
+        self.cprofile_lock = threading.Lock()
+        self.sequence = itertools.count()
+        self.stats_lock = threading.Lock()
+
+        self.profiled = 0
+        self.slow_captured = 0
+        self.skipped_busy = 0
+
+    def init_app(self, app):
+        os.makedirs(self.output_dir, exist_ok=True)
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        app.teardown_request(self.cleanup_request)
+        logger.info(f"Request profiling enabled (sample rate {self.sample_rate}, "
+                    f"slow threshold {self.slow_threshold}s, output {self.output_dir})")
+
+    def is_admin(self, token):
+        return bool(self.admin_token and token and hmac.compare_digest(token, self.admin_token))
+
+    def _requested(self):
+        token = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_PARAM)
+        return self.is_admin(token)
+
+    def start_request(self):
+        g.profile_started = time.perf_counter()
+        if self._requested() or (self.sample_rate and random.random() < self.sample_rate):
+            if self.cprofile_lock.acquire(blocking=False):
+                g.profiler = cProfile.Profile()
+                g.profiler.enable()
+            else:
+                with self.stats_lock:
+                    self.skipped_busy += 1
+        if self.sampler is not None and not request.environ.get(SPLIT_REQUEST_KEY):
+            g.profile_thread = threading.get_ident()
+            self.sampler.track(g.profile_thread)
+
+    def finish_request(self, response):
+        elapsed = time.perf_counter() - g.get('profile_started', time.perf_counter())
+        name = self._file_stem()
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            self.cprofile_lock.release()
+            path = os.path.join(self.output_dir, f"{name}.prof")
+            profiler.dump_stats(path)
+            with self.stats_lock:
+                self.profiled += 1
+            response.headers['X-Profile-File'] = os.path.basename(path)
+
+        thread_id = g.pop('profile_thread', None)
+        if thread_id is not None:
+            counts = self.sampler.untrack(thread_id)
+            if counts and elapsed >= self.slow_threshold:
+                path = os.path.join(self.output_dir, f"{name}.collapsed")
+                with open(path, 'w') as f:
+                    for stack, count in counts.most_common():
+                        f.write(f"{stack} {count}\n")
+                with self.stats_lock:
+                    self.slow_captured += 1
+                logger.warning(f"Slow request {request.method} {request.path} took {elapsed:.3f}s; stacks in {path}")
+
+        if profiler is not None or (thread_id is not None and elapsed >= self.slow_threshold):
+            self._prune()
+        return response
+
+    def cleanup_request(self, exc=None):
+        """Stop profiling requests that raised before after_request ran"""
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            self.cprofile_lock.release()
+        thread_id = g.pop('profile_thread', None)
+        if thread_id is not None:
+            self.sampler.untrack(thread_id)
+
+    def is_slow(self, elapsed):
+        return self.sampler is not None and elapsed >= self.slow_threshold
+
+    def record_phases(self, method, path, phases):
+        """Write a slow split request as collapsed stacks, one frame per (name, seconds) phase.
+
+        Each phase is weighted in sample intervals so the file reads like
+        the sampled captures in a flame graph viewer.
+        """
+        elapsed = sum(seconds for _, seconds in phases)
+        if not self.is_slow(elapsed):
+            return None
+        root = f"request:{method} {path}"
+        file_path = os.path.join(self.output_dir, f"{self._file_stem(method, path)}.collapsed")
+        with open(file_path, 'w') as f:
+            for name, seconds in phases:
+                f.write(f"{root};{name} {max(1, round(seconds / self.sampler.interval))}\n")
+        with self.stats_lock:
+            self.slow_captured += 1
+        logger.warning(f"Slow request {method} {path} took {elapsed:.3f}s; phases in {file_path}")
+        self._prune()
+        return file_path
+
+    def _file_stem(self, method=None, path=None):
+        method = method or request.method
+        path = re.sub(r'[^A-Za-z0-9]+', '_', path or request.path).strip('_') or 'root'
+        return f"{time.strftime('%Y%m%d-%H%M%S')}-{next(self.sequence):05d}-{method}-{path}"
+
+    def _prune(self):
+        """Keep only the newest max_files profiles"""
+        files = self.list_files()
+        for entry in files[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.output_dir, entry['file']))
+            except OSError:
+                pass
+
+    def list_files(self):
+        entries = []
+        for name in os.listdir(self.output_dir):
+            if name.endswith(('.prof', '.collapsed')):
+                stat = os.stat(os.path.join(self.output_dir, name))
+                entries.append({"file": name, "size": stat.st_size, "modified": stat.st_mtime})
+        return sorted(entries, key=lambda e: e['modified'], reverse=True)
+
+    def metrics(self):
+        with self.stats_lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "slow_threshold_seconds": self.slow_threshold,
+                "profiled": self.profiled,
+                "slow_captured": self.slow_captured,
+                "skipped_busy": self.skipped_busy,
+                "output_dir": self.output_dir
+            }
@@ -0,0 +1,206 @@
+"""
+Long-horizon EPF balance and credit-score projections across scenario grids
+"""
+
+from datetime import datetime
+from itertools import product
+
+import numpy as np
+
+# EPF defaults: employee share of basic pay, employer share credited to EPF
+# (the rest of the employer's 12% goes to the pension scheme) and the declared rate
+DEFAULT_EPF_ASSUMPTIONS = {
+    "employee_rate": 0.12,
+    "employer_rate": 0.0367,
+    "interest_rate": 0.0825,
+    "salary_growth": 0.05
+}
+
+SCORE_MIN = 300
+SCORE_MAX = 850
+SCORE_BANDS = [(800, 'Excellent'), (740, 'Very Good'), (670, 'Good'), (580, 'Fair'), (SCORE_MIN, 'Poor')]
+
+# Approximate score effect of revolving utilization, relative to the 10-30% band
+UTILIZATION_IMPACT = [(0.10, 15), (0.30, 0), (0.50, -25), (0.75, -50), (np.inf, -80)]
+
+# Months over which a history trend fades out; scores do not trend forever
+TREND_DECAY_MONTHS = 12.0
+
+
+def _first_number(document, *keys):
+    for key in keys:
+        value = document.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+    return None
+
+
+def extract_epf(epf):
+    """Balance, monthly basic salary and contribution assumptions from epf.json.
+
+    Missing fields are returned as None (balance, salary) or defaults (rates)
+    so callers can supply them explicitly.
+    """
+    epf = epf if isinstance(epf, dict) else {}
+    account = epf.get('account') if isinstance(epf.get('account'), dict) else epf
+    base = {
+        "balance": _first_number(account, 'balance', 'current_balance', 'total_balance'),
+        "monthly_salary": _first_number(account, 'monthly_salary', 'basic_salary', 'monthly_basic'),
+    }
+    for key, default in DEFAULT_EPF_ASSUMPTIONS.items():
+        value = _first_number(account, key)
+        # Rates given as percentages (8.25) are converted to fractions
+        base[key] = default if value is None else (value / 100 if value > 1 else value)
+    return base
+
+
+def project_epf(balance, monthly_salary, years=20, interest_rates=(0.0825,), contribution_rates=(0.1567,),
+                salary_growths=(0.05,), include_schedule=False):
+    """Project the EPF balance for every interest x contribution x salary-growth scenario.
+
+    State is one balance per scenario. Contributions are added monthly,
+    interest is computed monthly on the running balance and credited at
+    year end, and salary steps up once a year.
+    """
+    if years < 1 or years > 50:
+        raise ValueError("years must be between 1 and 50")
+    scenarios = list(product(interest_rates, contribution_rates, salary_growths))
+    if not scenarios:
+        raise ValueError("At least one scenario is required")
+    rates, contribution, growth = (np.array(column, dtype=float) for column in zip(*scenarios))
+
+    starting_balance = balance
+    balance = np.full(len(scenarios), float(balance))
+    salary = np.full(len(scenarios), float(monthly_salary))
+    contributed = np.zeros(len(scenarios))
+    interest_earned = np.zeros(len(scenarios))
+    yearly = np.empty((years, len(scenarios)))
+
+    for year in range(years):
+        accrued = np.zeros(len(scenarios))
+        for _ in range(12):
+            deposit = salary * contribution
+            balance += deposit
+            contributed += deposit
+            accrued += balance * rates / 12
+        balance += accrued
+        interest_earned += accrued
+        yearly[year] = balance
+        salary = salary * (1 + growth)
+
+    results = []
+    for i, (rate, contribution_rate, salary_growth) in enumerate(scenarios):
+        result = {
+            "interest_rate": rate,
+            "contribution_rate": contribution_rate,
+            "salary_growth": salary_growth,
+            "final_balance": round(float(balance[i]), 2),
+            "total_contributions": round(float(contributed[i]), 2),
+            "total_interest": round(float(interest_earned[i]), 2)
+        }
+        if include_schedule:
+            result["yearly_balances"] = [round(float(v), 2) for v in yearly[:, i]]
+        results.append(result)
+
+    return {
+        "starting_balance": round(float(starting_balance), 2),
+        "monthly_salary": round(float(monthly_salary), 2),
+        "years": years,
+        "scenarios": results
+    }
+
+
+def credit_utilization(liabilities):
+    """Revolving utilization across every liability with a credit_limit, or None"""
+    balance = 0.0
+    limit = 0.0
+    for items in (liabilities or {}).values():
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            if item.get('credit_limit'):
+                balance += float(item.get('balance', 0) or 0)
+                limit += float(item['credit_limit'])
+    return balance / limit if limit else None
+
+
+def score_band(score):
+    for floor, label in SCORE_BANDS:
+        if score >= floor:
+            return label
+    return SCORE_BANDS[-1][1]
+
+
+def utilization_impact(utilization):
+    utilization = np.asarray(utilization, dtype=float)
+    bounds = np.array([bound for bound, _ in UTILIZATION_IMPACT])
+    points = np.array([points for _, points in UTILIZATION_IMPACT], dtype=float)
+    return points[np.searchsorted(bounds, utilization, side='left')]
+
+
+def score_trend(history):
+    """Points per month from a least-squares fit over the dated history"""
+    points = []
+    for entry in history or []:
+        try:
+            points.append((datetime.strptime(entry['date'], '%Y-%m-%d'), float(entry['score'])))
+        except (KeyError, TypeError, ValueError):
+            continue
+    if len(points) < 2:
+        return 0.0
+    points.sort()
+    months = np.array([(date - points[0][0]).days / 30.44 for date, _ in points])
+    scores = np.array([score for _, score in points])
+    if np.ptp(months) == 0:
+        return 0.0
+    return float(np.polyfit(months, scores, 1)[0])
+
+
+def project_credit_score(current_score, history, utilization, target_utilizations=(), months=12,
+                         include_schedule=False):
+    """Project the score month by month for the current and each target utilization.
+
+    The history trend fades out over TREND_DECAY_MONTHS, and a change in
+    utilization shifts the score by the difference in UTILIZATION_IMPACT,
+    phased in over the next two statement cycles. Without a known current
+    utilization only the trend-only current scenario can be projected.
+    """
+    if months < 1 or months > 120:
+        raise ValueError("months must be between 1 and 120")
+    if utilization is None and len(target_utilizations):
+        raise ValueError("Current credit utilization is unknown (no liabilities with credit limits); "
+                         "pass current_utilization to compare target utilizations")
+    slope = score_trend(history)
+    current_utilization = utilization if utilization is not None else 0.0
+    targets = np.array([current_utilization] + [float(t) for t in target_utilizations])
+    if not np.isfinite(targets).all() or np.any((targets < 0) | (targets > 2)):
+        raise ValueError("utilization values must be fractions between 0 and 2")
+
+    horizon = np.arange(1, months + 1, dtype=float)
+    trend = slope * TREND_DECAY_MONTHS * (1 - np.exp(-horizon / TREND_DECAY_MONTHS))
+    shift = utilization_impact(targets) - utilization_impact(current_utilization)
+    phase_in = np.minimum(horizon / 2, 1.0)
+    paths = np.clip(current_score + trend[None, :] + shift[:, None] * phase_in[None, :], SCORE_MIN, SCORE_MAX)
+
+    results = []
+    for i, target in enumerate(targets):
+        final = float(paths[i, -1])
+        result = {
+            "utilization": None if i == 0 and utilization is None else round(float(target), 4),
+            "scenario": "current" if i == 0 else "target",
+            "projected_score": int(round(final)),
+            "projected_band": score_band(final),
+            "change": int(round(final - current_score))
+        }
+        if include_schedule:
+            result["monthly_scores"] = [int(round(v)) for v in paths[i]]
+        results.append(result)
+
+    return {
+        "current_score": current_score,
+        "current_band": score_band(current_score),
+        "current_utilization": round(utilization, 4) if utilization is not None else None,
+        "trend_points_per_month": round(slope, 2),
+        "months": months,
+        "scenarios": results
+    }
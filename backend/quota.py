@@ -0,0 +1,235 @@
+"""
+Client-side Gemini quota governor: token buckets for RPM/TPM with a priority queue
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+# Approximate per-minute quotas by model family, most specific match first
+DEFAULT_MODEL_LIMITS = [
+    ('flash-8b', {'rpm': 15, 'tpm': 1000000}),
+    ('flash', {'rpm': 15, 'tpm': 1000000}),
+    ('1.5-pro', {'rpm': 2, 'tpm': 32000}),
+    ('pro', {'rpm': 15, 'tpm': 32000}),
+]
+FALLBACK_LIMITS = {'rpm': 10, 'tpm': 32000}
+
+# Output tokens reserved per request on top of the prompt estimate
+EXPECTED_OUTPUT_TOKENS = 512
+
+
+class QuotaExceeded(Exception):
+    """Raised when a request cannot be admitted within its wait budget"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def limits_for_model(model_name, overrides=None):
+    """RPM/TPM limits for a model, with optional {name_fragment: limits} overrides"""
+    limits = dict(FALLBACK_LIMITS)
+    for fragment, family_limits in DEFAULT_MODEL_LIMITS:
+        if fragment in (model_name or ''):
+            limits.update(family_limits)
+            break
+    for fragment, override in (overrides or {}).items():
+        if fragment in (model_name or ''):
+            limits.update(override)
+            break
+    return limits
+
+
+def estimate_tokens(prompt):
+    """Rough token count (about four characters per token) plus the output reserve"""
+    return len(prompt) // 4 + EXPECTED_OUTPUT_TOKENS
+
+
+class TokenBucket:
+    """Bucket that refills continuously to `capacity` over one minute"""
+
+    def __init__(self, per_minute, clock=time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` can be taken (requests larger than capacity wait for a full bucket)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount, now):
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount):
+        """Charge (positive) or refund (negative) tokens after the fact; may go below zero"""
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+    def empty(self, now):
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class QuotaGovernor:
+    """Admits model requests in priority order once both buckets have room.
+
+    Callers block in acquire() until they reach the head of the queue and the
+    request and token buckets can cover them, or until their timeout passes.
+    Interactive requests (priority 0) are always admitted before background
+    work; equal priorities are first come, first served.
+    """
+
+    def __init__(self, model_name, rpm, tpm, max_queue=100, clock=time.monotonic):
+        self.model_name = model_name
+        self.clock = clock
+        self.requests = TokenBucket(rpm, clock)
+        self.tokens = TokenBucket(tpm, clock)
+        self.max_queue = max_queue
+        self.condition = threading.Condition()
+        self.queue = []
+        self.sequence = itertools.count()
+        self.blocked_until = 0.0
+
+        self.granted = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.peak_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent_waits = deque(maxlen=500)
+
+    def _wait_time(self, tokens, now):
+        return max(
+            self.blocked_until - now,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(tokens, now)
+        )
+
+    def _enqueue(self, priority):
+        if len(self.queue) >= self.max_queue:
+            self.rejected += 1
+            raise QuotaExceeded(f"{self.model_name} request queue is full", retry_after=60.0)
+        ticket = (priority, next(self.sequence))
+        heapq.heappush(self.queue, ticket)
+        self.peak_queue_depth = max(self.peak_queue_depth, len(self.queue))
+        return ticket
+
+    def _try_admit(self, ticket, tokens, start, timeout):
+        """(True, seconds waited) once admitted, else (False, seconds to wait); call holding the condition"""
+        now = self.clock()
+        wait = None
+        if self.queue[0] == ticket:
+            wait = self._wait_time(tokens, now)
+            if wait <= 0:
+                self.requests.consume(1, now)
+                self.tokens.consume(tokens, now)
+                heapq.heappop(self.queue)
+                self._record_grant(now - start)
+                return True, now - start
+
+        remaining = start + timeout - now
+        if remaining <= 0 or (wait is not None and wait > remaining):
+            self.rejected += 1
+            raise QuotaExceeded(f"{self.model_name} quota exhausted", retry_after=wait)
+        return False, min(wait, remaining) if wait is not None else remaining
+
+    def _dequeue(self, ticket):
+        if ticket in self.queue:
+            self.queue.remove(ticket)
+            heapq.heapify(self.queue)
+        self.condition.notify_all()
+
+    def acquire(self, tokens, priority=PRIORITY_INTERACTIVE, timeout=30.0):
+        """Block until the request is admitted and return the seconds spent waiting"""
+        with self.condition:
+            start = self.clock()
+            ticket = self._enqueue(priority)
+            try:
+                while True:
+                    admitted, wait = self._try_admit(ticket, tokens, start, timeout)
+                    if admitted:
+                        return wait
+                    self.condition.wait(wait)
+            finally:
+                self._dequeue(ticket)
+
+    async def acquire_async(self, tokens, priority=PRIORITY_INTERACTIVE, timeout=30.0, poll_interval=0.05):
+        """acquire() for event-loop callers: waits with asyncio.sleep instead of blocking a thread.
+
+        Async waiters share the queue with threaded ones but are not woken by
+        the condition, so they re-check at least every poll_interval.
+        """
+        with self.condition:
+            start = self.clock()
+            ticket = self._enqueue(priority)
+        try:
+            while True:
+                with self.condition:
+                    admitted, wait = self._try_admit(ticket, tokens, start, timeout)
+                if admitted:
+                    return wait
+                await asyncio.sleep(min(wait, poll_interval))
+        finally:
+            with self.condition:
+                self._dequeue(ticket)
+
+    def _record_grant(self, waited):
+        self.granted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self.recent_waits.append(waited)
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """Correct the token bucket once the real usage of a request is known"""
+        if actual_tokens is None:
+            return
+        with self.condition:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+    def penalize(self, retry_after=None):
+        """Back off after the server answered 429 despite the local limits"""
+        with self.condition:
+            now = self.clock()
+            self.throttled += 1
+            self.requests.empty(now)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def metrics(self):
+        with self.condition:
+            waits = sorted(self.recent_waits)
+            now = self.clock()
+            self.requests._refill(now)
+            self.tokens._refill(now)
+            return {
+                "model": self.model_name,
+                "rpm_limit": self.requests.capacity,
+                "tpm_limit": self.tokens.capacity,
+                "requests_available": round(self.requests.tokens, 2),
+                "tokens_available": round(self.tokens.tokens, 0),
+                "queue_depth": len(self.queue),
+                "peak_queue_depth": self.peak_queue_depth,
+                "granted": self.granted,
+                "rejected": self.rejected,
+                "server_throttled": self.throttled,
+                "average_wait_seconds": round(self.total_wait / self.granted, 3) if self.granted else 0.0,
+                "p95_wait_seconds": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+                "max_wait_seconds": round(self.max_wait, 3)
+            }
@@ -0,0 +1,90 @@
+"""
+SQLite-backed persistence for the AI response cache
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResponseStore:
+    """Durable copy of response_cache entries so restarts start warm.
+
+    Each entry keeps its creation time, the data sets it was answered from
+    and the dataset version at the time, so a restarted process only reloads
+    entries that are still fresh and still match the data on disk.
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                cache_key TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                context TEXT NOT NULL,
+                dataset_version TEXT NOT NULL,
+                response TEXT NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_created ON responses (created_at)")
+        self.conn.commit()
+
+    def put(self, cache_key, created_at, context_keys, dataset_version, response):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (cache_key, created_at, ",".join(sorted(context_keys)), dataset_version, response)
+            )
+            self.conn.commit()
+
+    def load_valid(self, version_for, now=None):
+        """Fresh entries whose dataset version still matches version_for(context_keys)"""
+        cutoff = (now or time.time()) - self.ttl
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT cache_key, created_at, context, dataset_version, response FROM responses WHERE created_at > ?",
+                (cutoff,)
+            ).fetchall()
+
+        valid = []
+        for cache_key, created_at, context, dataset_version, response in rows:
+            context_keys = [k for k in context.split(',') if k]
+            if version_for(context_keys) == dataset_version:
+                valid.append((cache_key, created_at, response))
+        return valid
+
+    def compact(self, version_for=None, now=None):
+        """Delete expired entries (and stale-version ones) and return how many were removed"""
+        cutoff = (now or time.time()) - self.ttl
+        with self.lock:
+            removed = self.conn.execute("DELETE FROM responses WHERE created_at <= ?", (cutoff,)).rowcount
+            if version_for is not None:
+                rows = self.conn.execute("SELECT cache_key, context, dataset_version FROM responses").fetchall()
+                stale = [(key,) for key, context, version in rows
+                         if version_for([k for k in context.split(',') if k]) != version]
+                self.conn.executemany("DELETE FROM responses WHERE cache_key = ?", stale)
+                removed += len(stale)
+            self.conn.commit()
+        return removed
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM responses")
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
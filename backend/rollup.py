@@ -0,0 +1,170 @@
+"""
+Time-bucketed rollup cube over transactions for dashboard slice-and-dice queries
+"""
+
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+
+GRAINS = ('day', 'week', 'month')
+DIMENSIONS = ('category', 'account', 'sign')
+
+
+def bucket_key(date, grain):
+    """Sortable bucket label for a date: day, ISO week start (Monday) or month"""
+    if grain == 'day':
+        return date.strftime('%Y-%m-%d')
+    if grain == 'week':
+        return (date - timedelta(days=date.weekday())).strftime('%Y-%m-%d')
+    if grain == 'month':
+        return date.strftime('%Y-%m')
+    raise ValueError(f"grain must be one of {', '.join(GRAINS)}")
+
+
+class RollupCube:
+    """Pre-aggregated totals keyed by grain x bucket x (category, account, sign).
+
+    Every transaction is folded into one cell per grain when it is loaded or
+    appended, so queries only walk the buckets inside the requested range and
+    never touch individual transactions. Amounts are stored as absolute
+    values with the sign kept as the income/expense dimension, matching
+    storage.summarize_rows.
+    """
+
+    def __init__(self, transactions=()):
+        self.lock = threading.RLock()
+        self.rebuild(transactions)
+
+    def rebuild(self, transactions):
+        """Discard every bucket and fold the given transactions in again"""
+        with self.lock:
+            self.cells = {grain: {} for grain in GRAINS}
+            self.buckets = {grain: [] for grain in GRAINS}
+            # Transactions without a parseable date still count towards totals
+            self.undated = {}
+            self.transaction_count = 0
+            self.add(transactions)
+
+    def add(self, transactions):
+        """Fold newly appended transactions into the cube"""
+        with self.lock:
+            for txn in transactions:
+                self._add(txn)
+
+    def _add(self, txn):
+        amount = txn.get('amount', 0)
+        cell_key = (
+            txn.get('category', 'other'),
+            txn.get('account', 'unknown'),
+            'income' if amount > 0 else 'expense'
+        )
+        self.transaction_count += 1
+
+        try:
+            date = datetime.strptime(txn['date'], '%Y-%m-%d')
+        except (KeyError, TypeError, ValueError):
+            self._accumulate(self.undated, cell_key, abs(amount))
+            return
+
+        for grain in GRAINS:
+            bucket = bucket_key(date, grain)
+            cells = self.cells[grain].get(bucket)
+            if cells is None:
+                cells = self.cells[grain][bucket] = {}
+                insort(self.buckets[grain], bucket)
+            self._accumulate(cells, cell_key, abs(amount))
+
+    @staticmethod
+    def _accumulate(cells, cell_key, value):
+        entry = cells.get(cell_key)
+        if entry is None:
+            cells[cell_key] = [value, 1]
+        else:
+            entry[0] += value
+            entry[1] += 1
+
+    def query(self, grain='month', start=None, end=None, group_by=('category',),
+              by_time=True, filters=None):
+        """Range-sum the cube, grouped by any subset of dimensions.
+
+        start/end are dates (YYYY-MM-DD) and snap to whole buckets of the
+        chosen grain; use the day grain for exact date ranges. filters maps
+        a dimension to the set of values to keep.
+        """
+        group_by = tuple(group_by)
+        for dim in group_by:
+            if dim not in DIMENSIONS:
+                raise ValueError(f"group_by dimensions must be among {', '.join(DIMENSIONS)}")
+        filters = {dim: set(values) for dim, values in (filters or {}).items() if values}
+        dim_index = {dim: i for i, dim in enumerate(DIMENSIONS)}
+
+        with self.lock:
+            buckets = self.buckets[grain] if grain in GRAINS else None
+            if buckets is None:
+                raise ValueError(f"grain must be one of {', '.join(GRAINS)}")
+            lo = bisect_left(buckets, bucket_key(_parse_date(start), grain)) if start else 0
+            hi = bisect_right(buckets, bucket_key(_parse_date(end), grain)) if end else len(buckets)
+
+            groups = {}
+            for bucket in buckets[lo:hi]:
+                for cell_key, (total, count) in self.cells[grain][bucket].items():
+                    if any(cell_key[dim_index[dim]] not in values for dim, values in filters.items()):
+                        continue
+                    key = ((bucket,) if by_time else ()) + tuple(cell_key[dim_index[dim]] for dim in group_by)
+                    self._accumulate_group(groups, key, total, count)
+
+        columns = (('bucket',) if by_time else ()) + group_by
+        rows = [
+            dict(zip(columns, key), total=round(total, 2), count=count)
+            for key, (total, count) in sorted(groups.items())
+        ]
+        return {
+            "grain": grain,
+            "start": start,
+            "end": end,
+            "group_by": list(group_by),
+            "rows": rows,
+            "total": round(sum(r['total'] for r in rows), 2),
+            "count": sum(r['count'] for r in rows)
+        }
+
+    @staticmethod
+    def _accumulate_group(groups, key, total, count):
+        entry = groups.get(key)
+        if entry is None:
+            groups[key] = [total, count]
+        else:
+            entry[0] += total
+            entry[1] += count
+
+    def spending_summary(self):
+        """Same shape as storage.summarize_rows, answered from the month buckets"""
+        total_income = 0
+        total_expenses = 0
+        category_totals = {}
+
+        with self.lock:
+            cell_maps = list(self.cells['month'].values()) + [self.undated]
+            for cells in cell_maps:
+                for (category, _, sign), (total, _) in cells.items():
+                    if sign == 'income':
+                        total_income += total
+                    else:
+                        total_expenses += total
+                        category_totals[category] = category_totals.get(category, 0) + total
+            transaction_count = self.transaction_count
+
+        return {
+            "total_income": total_income,
+            "total_expenses": total_expenses,
+            "net_income": total_income - total_expenses,
+            "category_breakdown": category_totals,
+            "transaction_count": transaction_count
+        }
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD")
@@ -0,0 +1,214 @@
+"""
+Inverted index over transaction descriptions and merchant names for search
+"""
+
+import re
+import threading
+from bisect import bisect_left, insort
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Reference numbers, store numbers and card suffixes are not part of a merchant's name
+NOISE_TOKEN = re.compile(r"\d")
+FUZZY_MIN_LENGTH = 4
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(str(text or '').lower())
+
+
+def merchant_key(description):
+    """Normalized merchant name: lowercase words without reference numbers"""
+    return ' '.join(t for t in tokenize(description) if not NOISE_TOKEN.search(t))
+
+
+def max_edits(term):
+    return 1 if len(term) < 8 else 2
+
+
+def deletes(term, distance):
+    """Every variant of term with up to `distance` characters removed"""
+    variants = {term}
+    frontier = {term}
+    for _ in range(distance):
+        frontier = {v[:i] + v[i + 1:] for v in frontier for i in range(len(v))}
+        variants |= frontier
+    return variants
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance, or limit + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class TransactionIndex:
+    """Token and merchant postings over the transaction ledger.
+
+    Each transaction gets a position; postings map description tokens,
+    merchant names and categories to the positions that contain them, so a
+    search only touches the transactions that match. Prefix lookups bisect a
+    sorted vocabulary and fuzzy lookups use a deletion-variant index, so
+    neither scans the ledger. Appends extend the postings in place.
+    """
+
+    def __init__(self, transactions=()):
+        self.lock = threading.RLock()
+        self.rebuild(transactions)
+
+    def rebuild(self, transactions):
+        with self.lock:
+            self.transactions = []
+            self.postings = {}
+            self.vocabulary = []
+            self.variants = {}
+            self.merchants = {}
+            self.merchant_names = {}
+            self.merchant_keys = []
+            self.categories = {}
+            self.add(transactions)
+
+    def add(self, transactions):
+        with self.lock:
+            for txn in transactions:
+                self._add(txn)
+
+    def _add(self, txn):
+        position = len(self.transactions)
+        self.transactions.append(txn)
+        description = txn.get('description', '')
+
+        for term in set(tokenize(description)):
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = []
+                insort(self.vocabulary, term)
+                if len(term) >= FUZZY_MIN_LENGTH:
+                    for variant in deletes(term, max_edits(term)):
+                        self.variants.setdefault(variant, set()).add(term)
+            postings.append(position)
+
+        key = merchant_key(description)
+        if key:
+            if key not in self.merchants:
+                self.merchants[key] = []
+                self.merchant_names[key] = description.strip()
+                insort(self.merchant_keys, key)
+            self.merchants[key].append(position)
+
+        self.categories.setdefault(txn.get('category', 'other'), []).append(position)
+
+    def _prefix_terms(self, prefix, sorted_terms):
+        terms = []
+        index = bisect_left(sorted_terms, prefix)
+        while index < len(sorted_terms) and sorted_terms[index].startswith(prefix):
+            terms.append(sorted_terms[index])
+            index += 1
+        return terms
+
+    def _fuzzy_terms(self, token):
+        if len(token) < FUZZY_MIN_LENGTH:
+            return []
+        limit = max_edits(token)
+        candidates = set()
+        for variant in deletes(token, limit):
+            candidates |= self.variants.get(variant, set())
+        return sorted(t for t in candidates if edit_distance(token, t, limit) <= limit)
+
+    def expand(self, token, fuzzy=True):
+        """Vocabulary terms a query token matches: prefix matches, else close spellings"""
+        terms = self._prefix_terms(token, self.vocabulary)
+        if not terms and fuzzy:
+            terms = self._fuzzy_terms(token)
+        return terms
+
+    def search(self, query=None, merchant=None, start=None, end=None, category=None,
+               fuzzy=True, page=1, page_size=50):
+        """Paginated matches (newest first) plus totals over every match.
+
+        Query tokens are ANDed, each matching by prefix or, failing that,
+        fuzzily. merchant matches normalized merchant names by prefix.
+        """
+        with self.lock:
+            candidate_sets = []
+            matched_terms = {}
+            for token in tokenize(query):
+                terms = self.expand(token, fuzzy)
+                matched_terms[token] = terms
+                candidate_sets.append({p for term in terms for p in self.postings[term]})
+
+            merchant_keys = []
+            if merchant:
+                key = merchant_key(merchant)
+                # An empty key would prefix-match every merchant
+                if not key:
+                    raise ValueError("merchant must contain a name, not only numbers or punctuation")
+                merchant_keys = self._prefix_terms(key, self.merchant_keys)
+                candidate_sets.append({p for key in merchant_keys for p in self.merchants[key]})
+
+            if category:
+                candidate_sets.append(set(self.categories.get(category, ())))
+
+            if not candidate_sets:
+                raise ValueError("A search query or merchant is required")
+
+            candidate_sets.sort(key=len)
+            positions = candidate_sets[0].intersection(*candidate_sets[1:])
+
+            matches = []
+            for position in positions:
+                txn = self.transactions[position]
+                txn_date = txn.get('date') or ''
+                if (start and txn_date < start) or (end and txn_date > end):
+                    continue
+                matches.append((txn_date, position))
+            matches.sort(reverse=True)
+
+            results = [self.transactions[p] for _, p in matches]
+            offset = (page - 1) * page_size
+            return {
+                "query": query,
+                "merchant": merchant,
+                "matched_terms": matched_terms,
+                "matched_merchants": [self.merchant_names[key] for key in merchant_keys],
+                "totals": self._totals(results),
+                "page": page,
+                "page_size": page_size,
+                "total_results": len(results),
+                "transactions": results[offset:offset + page_size]
+            }
+
+    def _totals(self, transactions):
+        income = 0.0
+        spent = 0.0
+        by_category = {}
+        by_merchant = {}
+        for txn in transactions:
+            amount = txn.get('amount', 0)
+            if amount > 0:
+                income += amount
+            else:
+                spent += abs(amount)
+            category = txn.get('category', 'other')
+            by_category[category] = by_category.get(category, 0) + amount
+            name = self.merchant_names.get(merchant_key(txn.get('description', '')), 'Unknown')
+            by_merchant[name] = by_merchant.get(name, 0) + amount
+        return {
+            "count": len(transactions),
+            "total_spent": round(spent, 2),
+            "total_income": round(income, 2),
+            "net": round(income - spent, 2),
+            "by_category": {k: round(v, 2) for k, v in by_category.items()},
+            "by_merchant": {k: round(v, 2) for k, v in by_merchant.items()}
+        }
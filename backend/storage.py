@@ -0,0 +1,409 @@
+"""
+Storage backends for the financial data: flat JSON files or an indexed SQLite database
+
+Run `python storage.py import` to load the JSON files into SQLite once.
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import sqlite3
+import statistics
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DATA_TYPES = ['assets', 'liabilities', 'transactions', 'epf', 'credit_score', 'investments']
+TRANSACTION_COLUMNS = ('id', 'date', 'description', 'amount', 'category', 'account', 'type')
+DEFAULT_USER = 'default'
+# Rows whose date does not look like YYYY-MM-DD are left out of monthly figures
+DATE_GLOB = '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'
+
+
+def summarize_rows(rows):
+    """Totals, net income and per-category expense sums and counts for a set of rows"""
+    total_income = 0
+    total_expenses = 0
+    category_totals = {}
+    category_counts = {}
+    count = 0
+    for txn in rows:
+        count += 1
+        amount = txn.get('amount', 0)
+        if amount > 0:
+            total_income += amount
+        else:
+            category = txn.get('category', 'other')
+            total_expenses += abs(amount)
+            category_totals[category] = category_totals.get(category, 0) + abs(amount)
+            category_counts[category] = category_counts.get(category, 0) + 1
+    return {
+        "total_income": total_income,
+        "total_expenses": total_expenses,
+        "net_income": total_income - total_expenses,
+        "category_breakdown": category_totals,
+        "category_counts": category_counts,
+        "transaction_count": count
+    }
+
+
+class JsonStorage:
+    """The original flat-file backend: one JSON document per data type under data_dir.
+
+    Queries filter `documents`, the live in-memory data the app serves, which
+    the caller binds after the initial load. The data files are read-only:
+    appended transactions are kept in memory and re-applied on every load,
+    so they survive a reload but not a restart.
+    """
+
+    name = 'json'
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.documents = {}
+        self.appended = []
+        self.lock = threading.Lock()
+
+    def load_all(self):
+        data = {}
+        for fname in DATA_TYPES:
+            try:
+                file_path = os.path.join(self.data_dir, f'{fname}.json')
+                if os.path.exists(file_path):
+                    with open(file_path, 'r') as f:
+                        data[fname] = json.load(f)
+                    logger.info(f"Loaded {fname}.json successfully")
+                else:
+                    logger.warning(f"File {fname}.json not found")
+                    data[fname] = {}
+            except Exception as e:
+                logger.error(f"Error loading {fname}.json: {str(e)}")
+                data[fname] = {}
+        with self.lock:
+            if self.appended:
+                data['transactions'].setdefault('transactions', []).extend(self.appended)
+        return data
+
+    def append_transactions(self, records, document):
+        """Records are already in the in-memory document; remember them for later loads"""
+        with self.lock:
+            self.appended.extend(records)
+
+    def _transactions(self):
+        return self.documents.get('transactions', {}).get('transactions', [])
+
+    def _matches(self, txn, start, end, category, account):
+        txn_date = txn.get('date', '')
+        return ((not start or txn_date >= start) and (not end or txn_date <= end) and
+                (not category or txn.get('category', 'other') == category) and
+                (not account or txn.get('account') == account))
+
+    def iter_transactions(self, start=None, end=None, category=None, account=None, columns=None):
+        for txn in self._transactions():
+            if self._matches(txn, start, end, category, account):
+                yield {c: txn.get(c) for c in columns} if columns else txn
+
+    def spending_summary(self, start=None, end=None, category=None, account=None):
+        return summarize_rows(self.iter_transactions(start, end, category, account))
+
+    def get_document(self, name):
+        return self.documents.get(name, {})
+
+    def transaction_count(self):
+        return len(self._transactions())
+
+    def _expense_amounts(self):
+        for txn in self._transactions():
+            amount = txn.get('amount', 0)
+            if amount < 0:
+                yield txn, -amount
+
+    def expense_stats(self):
+        """Count, mean and sample standard deviation of expense amounts"""
+        expenses = [amount for _, amount in self._expense_amounts()]
+        return {
+            "count": len(expenses),
+            "mean": statistics.mean(expenses) if expenses else 0.0,
+            "stdev": statistics.stdev(expenses) if len(expenses) > 1 else 0.0
+        }
+
+    def expenses_above(self, threshold):
+        return [txn for txn, amount in self._expense_amounts() if amount > threshold]
+
+    def monthly_expenses(self):
+        """Expense totals per YYYY-MM, in order of each month's first transaction"""
+        totals = {}
+        for txn, amount in self._expense_amounts():
+            try:
+                date = datetime.strptime(txn.get('date', ''), '%Y-%m-%d')
+            except (TypeError, ValueError):
+                continue
+            month = f"{date.year}-{date.month:02d}"
+            totals[month] = totals.get(month, 0) + amount
+        return totals
+
+    def category_stats(self, recent=3):
+        """Expense total, count and average of the latest `recent` expenses per category"""
+        amounts = {}
+        for txn, amount in self._expense_amounts():
+            amounts.setdefault(txn.get('category', 'other'), []).append(amount)
+        return {
+            category: {"total": sum(values), "count": len(values),
+                       "recent_average": sum(values[-recent:]) / min(recent, len(values))}
+            for category, values in amounts.items()
+        }
+
+    def income_month_count(self):
+        return len({str(txn.get('date', ''))[:7] for txn in self._transactions() if txn.get('amount', 0) > 0})
+
+
+class SqliteStorage:
+    """Local SQLite database in WAL mode.
+
+    Transactions live in their own indexed table so date, category and
+    account filters, spending summaries and the analytics aggregations
+    (expense statistics, monthly and per-category totals) run inside SQLite
+    instead of over the in-memory ledger. The other
+    data types are small documents stored as JSON bodies. Each thread gets
+    its own connection; WAL lets readers proceed while a writer commits.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, db_path, user_id=DEFAULT_USER):
+        self.db_path = db_path
+        self.user_id = user_id
+        self.local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._create_schema()
+
+    @property
+    def conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        with self.conn as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    name TEXT PRIMARY KEY,
+                    body TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS transactions (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL,
+                    id TEXT,
+                    date TEXT,
+                    description TEXT,
+                    amount REAL NOT NULL DEFAULT 0,
+                    category TEXT NOT NULL DEFAULT 'other',
+                    account TEXT,
+                    type TEXT,
+                    extra TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions (user_id, date);
+                CREATE INDEX IF NOT EXISTS idx_transactions_user_category ON transactions (user_id, category);
+                CREATE INDEX IF NOT EXISTS idx_transactions_account ON transactions (account);
+            """)
+
+    def is_empty(self):
+        return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] == 0
+
+    def _row_to_transaction(self, row, columns=None):
+        if columns:
+            return {c: row[c] for c in columns}
+        txn = {c: row[c] for c in TRANSACTION_COLUMNS}
+        if row['extra']:
+            txn.update(json.loads(row['extra']))
+        return txn
+
+    def _transaction_params(self, txn):
+        extra = {k: v for k, v in txn.items() if k not in TRANSACTION_COLUMNS}
+        return (self.user_id, txn.get('id'), txn.get('date'), txn.get('description'),
+                float(txn.get('amount', 0) or 0), txn.get('category') or 'other',
+                txn.get('account'), txn.get('type'), json.dumps(extra) if extra else None)
+
+    def load_all(self):
+        data = {name: {} for name in DATA_TYPES}
+        for row in self.conn.execute("SELECT name, body FROM documents"):
+            data[row['name']] = json.loads(row['body'])
+        rows = self.conn.execute(
+            "SELECT * FROM transactions WHERE user_id = ? ORDER BY seq", (self.user_id,)
+        ).fetchall()
+        if rows or data['transactions']:
+            data['transactions']['transactions'] = [self._row_to_transaction(r) for r in rows]
+        logger.info(f"Loaded financial data from SQLite ({self.db_path})")
+        return data
+
+    def save_document(self, name, document):
+        body = dict(document)
+        with self.conn as conn:
+            if name == 'transactions':
+                transactions = body.pop('transactions', [])
+                conn.execute("DELETE FROM transactions WHERE user_id = ?", (self.user_id,))
+                conn.executemany(
+                    "INSERT INTO transactions (user_id, id, date, description, amount, category, account, type, extra) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [self._transaction_params(t) for t in transactions]
+                )
+            conn.execute("INSERT OR REPLACE INTO documents (name, body) VALUES (?, ?)", (name, json.dumps(body)))
+
+    def append_transactions(self, records, document=None):
+        with self.conn as conn:
+            conn.executemany(
+                "INSERT INTO transactions (user_id, id, date, description, amount, category, account, type, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [self._transaction_params(t) for t in records]
+            )
+            conn.execute("INSERT OR IGNORE INTO documents (name, body) VALUES ('transactions', '{}')")
+
+    def _where(self, start, end, category, account):
+        clauses, params = ["user_id = ?"], [self.user_id]
+        for clause, value in (("date >= ?", start), ("date <= ?", end),
+                              ("category = ?", category), ("account = ?", account)):
+            if value:
+                clauses.append(clause)
+                params.append(value)
+        return " AND ".join(clauses), params
+
+    def iter_transactions(self, start=None, end=None, category=None, account=None, columns=None,
+                          batch_size=1000):
+        if columns and not set(columns) <= set(TRANSACTION_COLUMNS):
+            raise ValueError(f"Unknown transaction columns: {', '.join(set(columns) - set(TRANSACTION_COLUMNS))}")
+        where, params = self._where(start, end, category, account)
+        select = ", ".join(columns) if columns else "*"
+        cursor = self.conn.execute(f"SELECT {select} FROM transactions WHERE {where} ORDER BY seq", params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield self._row_to_transaction(row, columns)
+
+    def spending_summary(self, start=None, end=None, category=None, account=None):
+        where, params = self._where(start, end, category, account)
+        totals = self.conn.execute(f"""
+            SELECT COUNT(*) AS n,
+                   COALESCE(SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END), 0) AS income,
+                   COALESCE(SUM(CASE WHEN amount <= 0 THEN -amount ELSE 0 END), 0) AS expenses
+            FROM transactions WHERE {where}
+        """, params).fetchone()
+        categories = self.conn.execute(f"""
+            SELECT category, SUM(-amount) AS total, COUNT(*) AS n
+            FROM transactions WHERE {where} AND amount <= 0 GROUP BY category
+        """, params).fetchall()
+        return {
+            "total_income": totals['income'],
+            "total_expenses": totals['expenses'],
+            "net_income": totals['income'] - totals['expenses'],
+            "category_breakdown": {row['category']: row['total'] for row in categories},
+            "category_counts": {row['category']: row['n'] for row in categories},
+            "transaction_count": totals['n']
+        }
+
+    def get_document(self, name):
+        row = self.conn.execute("SELECT body FROM documents WHERE name = ?", (name,)).fetchone()
+        document = json.loads(row['body']) if row else {}
+        if name == 'transactions' and row:
+            document['transactions'] = list(self.iter_transactions())
+        return document
+
+    def transaction_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM transactions WHERE user_id = ?", (self.user_id,)).fetchone()[0]
+
+    def expense_stats(self):
+        row = self.conn.execute(
+            "SELECT COUNT(*) AS n, COALESCE(AVG(-amount), 0) AS mean FROM transactions WHERE user_id = ? AND amount < 0",
+            (self.user_id,)
+        ).fetchone()
+        stdev = 0.0
+        if row['n'] > 1:
+            # Second pass around the mean; a sum of squares would lose precision on large ledgers
+            squares = self.conn.execute(
+                "SELECT SUM((-amount - ?) * (-amount - ?)) FROM transactions WHERE user_id = ? AND amount < 0",
+                (row['mean'], row['mean'], self.user_id)
+            ).fetchone()[0]
+            stdev = math.sqrt(squares / (row['n'] - 1))
+        return {"count": row['n'], "mean": row['mean'], "stdev": stdev}
+
+    def expenses_above(self, threshold):
+        rows = self.conn.execute(
+            "SELECT * FROM transactions WHERE user_id = ? AND amount < 0 AND -amount > ? ORDER BY seq",
+            (self.user_id, threshold)
+        ).fetchall()
+        return [self._row_to_transaction(row) for row in rows]
+
+    def monthly_expenses(self):
+        rows = self.conn.execute("""
+            SELECT substr(date, 1, 7) AS month, SUM(-amount) AS total
+            FROM transactions WHERE user_id = ? AND amount < 0 AND date GLOB ?
+            GROUP BY month ORDER BY MIN(seq)
+        """, (self.user_id, DATE_GLOB)).fetchall()
+        return {row['month']: row['total'] for row in rows}
+
+    def category_stats(self, recent=3):
+        rows = self.conn.execute("""
+            SELECT category, SUM(-amount) AS total, COUNT(*) AS n,
+                   SUM(CASE WHEN recency <= ? THEN -amount ELSE 0 END) AS recent_total
+            FROM (
+                SELECT seq, category, amount,
+                       ROW_NUMBER() OVER (PARTITION BY category ORDER BY seq DESC) AS recency
+                FROM transactions WHERE user_id = ? AND amount < 0
+            )
+            GROUP BY category ORDER BY MIN(seq)
+        """, (recent, self.user_id)).fetchall()
+        return {
+            row['category']: {"total": row['total'], "count": row['n'],
+                              "recent_average": row['recent_total'] / min(recent, row['n'])}
+            for row in rows
+        }
+
+    def income_month_count(self):
+        return self.conn.execute(
+            "SELECT COUNT(DISTINCT substr(date, 1, 7)) FROM transactions WHERE user_id = ? AND amount > 0",
+            (self.user_id,)
+        ).fetchone()[0]
+
+    def import_json(self, data_dir):
+        """One-shot import of the flat JSON files into the database"""
+        documents = JsonStorage(data_dir).load_all()
+        for name, document in documents.items():
+            if document:
+                self.save_document(name, document)
+        count = self.conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        logger.info(f"Imported {len([d for d in documents.values() if d])} data files and {count} transactions into {self.db_path}")
+        return count
+
+
+def create_storage(backend, data_dir, db_path):
+    """Build the configured backend, importing the JSON files into an empty database"""
+    if backend == 'sqlite':
+        storage = SqliteStorage(db_path)
+        if storage.is_empty():
+            storage.import_json(data_dir)
+        return storage
+    if backend != 'json':
+        logger.warning(f"Unknown storage backend '{backend}', falling back to JSON files")
+    return JsonStorage(data_dir)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Financial data storage tools")
+    parser.add_argument('command', choices=['import'], help="import: load the JSON data files into SQLite")
+    parser.add_argument('--data-dir', default=os.path.join(os.path.dirname(__file__), 'data'))
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(__file__), 'data', 'finance.sqlite3'))
+    args = parser.parse_args()
+
+    SqliteStorage(args.db).import_json(args.data_dir)
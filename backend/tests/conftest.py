@@ -0,0 +1,47 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeClock:
+    """Monotonic clock that only moves when a test advances it"""
+
+    def __init__(self, start=1000.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(scope='session')
+def main_module(tmp_path_factory):
+    """The Flask app module, with its caches written to a temporary directory"""
+    pytest.importorskip('google.generativeai')
+    cache_dir = tmp_path_factory.mktemp('cache')
+    os.environ.pop('GEMINI_API_KEY', None)
+    os.environ.update({
+        'STORAGE_BACKEND': 'json',
+        'PERSIST_RESPONSE_CACHE': 'false',
+        'AUTO_REFRESH_DATA': 'false',
+        'CATEGORIZER_MODEL_PATH': str(cache_dir / 'categorizer.joblib'),
+        'PROFILE_DIR': str(cache_dir / 'profiles'),
+    })
+    import main
+    return main
+
+
+@pytest.fixture
+def client(main_module):
+    return main_module.app.test_client()
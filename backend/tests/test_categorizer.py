@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip('sklearn')
+import joblib
+
+from categorizer import TransactionCategorizer, label_version
+
+LEDGER = [
+    {"description": "Corner Bakery", "amount": -8.0, "account": "checking", "category": "food"},
+    {"description": "City Parking Garage", "amount": -12.0, "account": "checking", "category": "transportation"},
+    {"description": "Mystery Charge", "amount": -3.0, "account": "checking", "category": "other"},
+]
+
+
+def test_auto_categorized_rows_do_not_change_the_labels():
+    categorized = dict(LEDGER[0], description="Corner Bakery #2", category_confidence=0.9)
+    assert label_version(LEDGER + [categorized]) == label_version(LEDGER)
+    assert label_version(LEDGER + [dict(LEDGER[0], category="entertainment")]) != label_version(LEDGER)
+
+
+def test_saved_model_is_reused_while_labels_match(tmp_path):
+    path = str(tmp_path / 'categorizer.joblib')
+    trained = TransactionCategorizer.load_or_train(path, LEDGER)
+    loaded = TransactionCategorizer.load_or_train(path, LEDGER)
+    assert loaded.label_version == trained.label_version == label_version(LEDGER)
+
+
+def test_saved_model_is_retrained_when_labels_change(tmp_path):
+    path = str(tmp_path / 'categorizer.joblib')
+    TransactionCategorizer.load_or_train(path, LEDGER)
+    relabeled = LEDGER + [{"description": "Arcade", "amount": -20.0, "category": "entertainment"}]
+
+    categorizer = TransactionCategorizer.load_or_train(path, relabeled)
+    assert categorizer.label_version == label_version(relabeled)
+    assert TransactionCategorizer.load(path).label_version == label_version(relabeled)
+
+
+def test_artifacts_without_a_label_version_are_retrained(tmp_path):
+    path = str(tmp_path / 'categorizer.joblib')
+    joblib.dump(TransactionCategorizer.train(LEDGER).model, path)
+    assert TransactionCategorizer.load(path).label_version is None
+    assert TransactionCategorizer.load_or_train(path, LEDGER).label_version == label_version(LEDGER)
+
+
+def test_predict_rejects_non_finite_amounts():
+    categorizer = TransactionCategorizer.train(LEDGER)
+    with pytest.raises(ValueError):
+        categorizer.predict([{"description": "Cafe", "amount": "nan"}])
+    assert categorizer.predict([{"description": "Corner Bakery", "amount": "-8"}])[0][0] == 'food'
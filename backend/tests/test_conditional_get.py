@@ -0,0 +1,45 @@
+def test_data_route_answers_304_for_a_current_etag(client):
+    response = client.get('/data/transactions')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    cached = client.get('/data/transactions', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.headers['ETag'] == etag
+    assert cached.data == b''
+
+
+def test_etag_changes_with_the_data_version(client, main_module, monkeypatch):
+    etag = client.get('/analytics/anomalies').headers['ETag']
+    monkeypatch.setitem(main_module.data_versions, 'transactions', 'changed')
+
+    response = client.get('/analytics/anomalies', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_etag_depends_on_the_query_string(client):
+    first = client.get('/data/transactions/filter?category=food').headers['ETag']
+    second = client.get('/data/transactions/filter?category=utilities').headers['ETag']
+    assert first != second
+    assert client.get('/data/transactions/filter?category=utilities',
+                      headers={'If-None-Match': first}).status_code == 200
+
+
+def test_etag_depends_on_the_session_permissions(client):
+    etag = client.get('/data/summary').headers['ETag']
+    client.post('/permissions', json={'transactions': False})
+    assert client.get('/data/summary', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_status_routes_are_not_conditional(client):
+    for path in ('/health', '/query/router', '/data/transactions/categorize'):
+        response = client.get(path)
+        assert 'ETag' not in response.headers, path
+
+
+def test_error_responses_carry_no_etag(client):
+    response = client.get('/data/transactions/search?q=!!!')
+    assert response.status_code == 400
+    assert 'ETag' not in response.headers
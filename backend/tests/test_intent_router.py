@@ -0,0 +1,61 @@
+import pytest
+
+from intent_router import FALLTHROUGH, ROUTING_CASES, IntentRouter
+
+CATEGORIES = ['food', 'transportation', 'utilities', 'income']
+
+
+@pytest.fixture(scope='module')
+def router():
+    return IntentRouter(CATEGORIES)
+
+
+@pytest.mark.parametrize("query, expected", ROUTING_CASES)
+def test_routing_cases(router, query, expected):
+    match = router.route(query)
+    assert (match.intent if match else FALLTHROUGH) == expected
+
+
+@pytest.mark.parametrize("query", [
+    "How much did I spend in 2024?",
+    "How much did I spend in December?",
+    "How much did I spend on food last weekend?",
+    "How much did I spend on 3/15?",
+    "How much have I spent in the past 6 months?",
+    "How much did I spend this month and last year?",
+    "What was my credit score last month?",
+    "How much did I spend on food, utilities and transportation?",
+    "How much did I spend at Target, Costco?",
+    "How much did I get in wages this year?",
+])
+def test_unresolved_questions_fall_through(router, query):
+    assert router.route(query) is None
+
+
+def test_slots_for_a_timeframe_and_category(router):
+    match = router.route("How much did I spend on groceries last quarter?")
+    assert match.intent == 'spending'
+    assert match.slots == {"timeframe": "last_quarter", "category": "food", "merchant": None}
+
+
+def test_synonyms_of_one_category_are_not_ambiguous(router):
+    assert router.match_categories("groceries and restaurants") == ['food']
+    assert router.match_categories("food and gas") == ['food', 'transportation']
+
+
+def test_merchant_slot_stops_at_the_timeframe(router):
+    match = router.route("How much did I spend at the Corner Cafe last month?")
+    assert match.intent == 'merchant_spending'
+    assert match.slots['merchant'] == 'Corner Cafe'
+    assert match.slots['timeframe'] == 'last_month'
+
+
+def test_record_counts_hits_and_fallthroughs():
+    router = IntentRouter(CATEGORIES)
+    router.record(router.route("What is my net worth?"))
+    router.record(router.route("Should I pay off my loan early?"))
+    metrics = router.metrics()
+    assert metrics['queries'] == 2
+    assert metrics['hits_by_intent'] == {'net_worth': 1}
+    assert metrics['passed_to_llm'] == 1
+    assert metrics['hit_rate'] == 0.5
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from model_pool import ModelPool, ModelUnavailable, ScriptedModel, is_transient_error
+
+
+class ServerError(Exception):
+    code = 503
+
+
+class InvalidArgument(Exception):
+    code = 400
+
+
+def make_pool(clock, *models, **kwargs):
+    kwargs.setdefault('failure_threshold', 2)
+    kwargs.setdefault('cooldown', 30.0)
+    return ModelPool([(m._model_name, m) for m in models], clock=clock, **kwargs)
+
+
+def state(pool, name):
+    return pool.stats[name].state
+
+
+@pytest.mark.parametrize("error, transient", [
+    (TimeoutError(), True),
+    (ConnectionError("reset by peer"), True),
+    (ServerError("backend error"), True),
+    (Exception("429 Resource has been exhausted"), True),
+    (Exception("503 The service is currently unavailable"), True),
+    (InvalidArgument("request contains an invalid argument"), False),
+    (Exception("400 API key not valid"), False),
+    (ValueError("response was blocked for safety"), False),
+])
+def test_is_transient_error(error, transient):
+    assert is_transient_error(error) is transient
+
+
+def test_consecutive_transient_failures_open_the_circuit(clock):
+    flaky = ScriptedModel('flaky-flash', [ServerError("down")], sleep=lambda s: None)
+    backup = ScriptedModel('backup-flash', sleep=lambda s: None)
+    pool = make_pool(clock, flaky, backup)
+
+    for _ in range(2):
+        response, name = pool.generate("hi")
+        assert name == 'backup-flash'
+    assert state(pool, 'flaky-flash') == 'open'
+    assert pool.candidates() == ['backup-flash']
+
+
+def test_half_open_trial_closes_the_circuit_on_success(clock):
+    model = ScriptedModel('only-flash', [ServerError("down"), ServerError("down"), 0.0], sleep=lambda s: None)
+    pool = make_pool(clock, model)
+    for _ in range(2):
+        with pytest.raises(ServerError):
+            pool.generate("hi", max_attempts=1)
+    assert state(pool, 'only-flash') == 'open'
+    with pytest.raises(ModelUnavailable):
+        pool.generate("hi")
+
+    clock.advance(30)
+    assert pool.generate("hi")[1] == 'only-flash'
+    assert state(pool, 'only-flash') == 'closed'
+
+
+def test_half_open_trial_reopens_on_failure(clock):
+    model = ScriptedModel('only-flash', [ServerError("down")], sleep=lambda s: None)
+    pool = make_pool(clock, model)
+    for _ in range(2):
+        with pytest.raises(ServerError):
+            pool.generate("hi", max_attempts=1)
+
+    clock.advance(30)
+    with pytest.raises(ServerError):
+        pool.generate("hi")
+    # The half-open model got a single trial call, then opened again
+    assert model.calls == 3
+    assert state(pool, 'only-flash') == 'open'
+
+
+def test_half_open_trial_is_claimed_once(clock):
+    pool = make_pool(clock, ScriptedModel('only-flash', sleep=lambda s: None))
+    stats = pool.stats['only-flash']
+    stats.state, stats.opened_at = 'open', clock()
+    clock.advance(30)
+    assert pool._claim('only-flash')
+    assert not pool._claim('only-flash')
+    pool._release('only-flash')
+    assert pool._claim('only-flash')
+
+
+def test_non_transient_errors_are_raised_without_failover(clock):
+    broken = ScriptedModel('broken-flash', [InvalidArgument("bad request")], sleep=lambda s: None)
+    backup = ScriptedModel('backup-flash', sleep=lambda s: None)
+    pool = make_pool(clock, broken, backup)
+
+    for _ in range(3):
+        with pytest.raises(InvalidArgument):
+            pool.generate("hi")
+    assert backup.calls == 0
+    assert state(pool, 'broken-flash') == 'closed'
+    assert pool.stats['broken-flash'].failures == 0
+
+
+def test_generate_async_fails_over_on_transient_errors(clock):
+    flaky = ScriptedModel('flaky-flash', [TimeoutError()])
+    backup = ScriptedModel('backup-flash')
+    pool = make_pool(clock, flaky, backup)
+
+    response, name = asyncio.run(pool.generate_async("hi"))
+    assert name == 'backup-flash'
+    assert pool.stats['flaky-flash'].failures == 1
+
+
+def test_heavy_queries_prefer_heavy_models(clock):
+    light = ScriptedModel('gemini-flash', sleep=lambda s: None)
+    heavy = ScriptedModel('gemini-pro', sleep=lambda s: None)
+    pool = make_pool(clock, light, heavy)
+    assert pool.generate("hi", query="should I refinance my loan?")[1] == 'gemini-pro'
+    assert pool.generate("hi", query="net worth")[1] == 'gemini-flash'
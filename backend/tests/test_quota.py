@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from quota import PRIORITY_BACKGROUND, QuotaExceeded, QuotaGovernor, limits_for_model
+
+
+def make_governor(clock, rpm=2, tpm=1000, **kwargs):
+    return QuotaGovernor('gemini-test-flash', rpm=rpm, tpm=tpm, clock=clock, **kwargs)
+
+
+def test_admits_until_the_request_bucket_is_empty(clock):
+    governor = make_governor(clock)
+    assert governor.acquire(10, timeout=0) == 0
+    assert governor.acquire(10, timeout=0) == 0
+    with pytest.raises(QuotaExceeded) as excinfo:
+        governor.acquire(10, timeout=0)
+    # 2 RPM refills one request every 30 seconds
+    assert excinfo.value.retry_after == pytest.approx(30.0)
+    assert governor.metrics()['granted'] == 2
+    assert governor.metrics()['rejected'] == 1
+
+
+def test_bucket_refills_with_the_clock(clock):
+    governor = make_governor(clock)
+    governor.acquire(10, timeout=0)
+    governor.acquire(10, timeout=0)
+    clock.advance(30)
+    assert governor.acquire(10, timeout=0) == 0
+
+
+def test_token_bucket_limits_large_prompts(clock):
+    governor = make_governor(clock, rpm=100, tpm=1000)
+    governor.acquire(900, timeout=0)
+    with pytest.raises(QuotaExceeded):
+        governor.acquire(200, timeout=0)
+    governor.acquire(100, timeout=0)
+
+
+def test_settle_refunds_unused_tokens(clock):
+    governor = make_governor(clock, rpm=100, tpm=1000)
+    governor.acquire(900, timeout=0)
+    governor.settle(900, 100)
+    assert governor.acquire(800, timeout=0) == 0
+
+
+def test_penalize_blocks_until_retry_after(clock):
+    governor = make_governor(clock, rpm=100)
+    governor.penalize(retry_after=5)
+    with pytest.raises(QuotaExceeded):
+        governor.acquire(10, timeout=0)
+    # Past the block; the emptied request bucket has refilled by then at 100 per minute
+    clock.advance(6)
+    assert governor.acquire(10, timeout=0) == 0
+    assert governor.metrics()['server_throttled'] == 1
+
+
+def test_full_queue_rejects_immediately(clock):
+    governor = make_governor(clock, max_queue=0)
+    with pytest.raises(QuotaExceeded, match="queue is full"):
+        governor.acquire(10, timeout=30)
+
+
+def test_interactive_requests_go_before_background_work(clock):
+    governor = make_governor(clock)
+    with governor.condition:
+        background = governor._enqueue(PRIORITY_BACKGROUND)
+        interactive = governor._enqueue(0)
+        assert governor.queue[0] == interactive
+        governor._dequeue(interactive)
+        assert governor.queue[0] == background
+
+
+def test_acquire_async_admits_and_rejects(clock):
+    governor = make_governor(clock, rpm=1)
+    assert asyncio.run(governor.acquire_async(10, timeout=0)) == 0
+    with pytest.raises(QuotaExceeded):
+        asyncio.run(governor.acquire_async(10, timeout=0))
+    assert governor.metrics()['queue_depth'] == 0
+
+
+def test_limits_for_model_prefers_the_most_specific_family():
+    assert limits_for_model('gemini-1.5-pro')['rpm'] == 2
+    assert limits_for_model('gemini-1.5-flash')['rpm'] == 15
+    assert limits_for_model('gemini-1.5-flash', {'flash': {'rpm': 60}})['rpm'] == 60
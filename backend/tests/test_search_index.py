@@ -0,0 +1,116 @@
+import pytest
+
+from search_index import TransactionIndex, edit_distance, merchant_key
+
+TRANSACTIONS = [
+    {"id": "t1", "date": "2024-01-03", "description": "STARBUCKS #1234 SEATTLE", "amount": -5.5, "category": "food"},
+    {"id": "t2", "date": "2024-01-10", "description": "Starbucks #998 Portland", "amount": -6.25, "category": "food"},
+    {"id": "t3", "date": "2024-02-01", "description": "Shell Gas Station", "amount": -40.0, "category": "transportation"},
+    {"id": "t4", "date": "2024-02-15", "description": "Payroll Deposit ACME", "amount": 2500.0, "category": "income"},
+    {"id": "t5", "date": "2024-03-02", "description": "7-11 Store 42", "amount": -3.0, "category": "food"},
+    {"id": "t6", "date": "2024-03-05", "description": "Electric Company", "amount": -90.0, "category": "utilities"},
+]
+
+
+@pytest.fixture
+def index():
+    return TransactionIndex(TRANSACTIONS)
+
+
+def ids(result):
+    return [txn['id'] for txn in result['transactions']]
+
+
+@pytest.mark.parametrize("description, key", [
+    ("STARBUCKS #1234 SEATTLE", "starbucks seattle"),
+    ("Shell Gas Station", "shell gas station"),
+    ("7-11 Store 42", "store"),
+    ("123", ""),
+    ("7-11", ""),
+    ("", ""),
+    (None, ""),
+])
+def test_merchant_key(description, key):
+    assert merchant_key(description) == key
+
+
+def test_prefix_query_matches_newest_first(index):
+    result = index.search(query="starb")
+    assert ids(result) == ['t2', 't1']
+    assert result['totals']['total_spent'] == 11.75
+
+
+def test_query_tokens_are_anded(index):
+    assert ids(index.search(query="starbucks portland")) == ['t2']
+    assert ids(index.search(query="starbucks shell")) == []
+
+
+def test_fuzzy_matching_can_be_turned_off(index):
+    assert ids(index.search(query="electirc")) == ['t6']
+    assert ids(index.search(query="electirc", fuzzy=False)) == []
+
+
+def test_short_tokens_are_not_fuzzy_matched(index):
+    assert ids(index.search(query="shel")) == ['t3']
+    assert ids(index.search(query="shwl")) == []
+
+
+def test_merchant_filter_ignores_store_numbers(index):
+    result = index.search(merchant="Starbucks #55")
+    assert ids(result) == ['t2', 't1']
+    assert sorted(result['matched_merchants']) == ["STARBUCKS #1234 SEATTLE", "Starbucks #998 Portland"]
+
+
+@pytest.mark.parametrize("merchant", ["123", "7-11", "#", "  "])
+def test_merchant_without_a_name_is_rejected(index, merchant):
+    with pytest.raises(ValueError):
+        index.search(merchant=merchant)
+
+
+@pytest.mark.parametrize("query", [None, "", "!!!", "   "])
+def test_query_without_tokens_is_rejected(index, query):
+    with pytest.raises(ValueError):
+        index.search(query=query)
+
+
+def test_category_alone_is_a_valid_search(index):
+    assert ids(index.search(query="!!!", category="utilities")) == ['t6']
+
+
+def test_date_range_and_pagination(index):
+    result = index.search(category="food", start="2024-01-05", end="2024-03-31", page_size=1)
+    assert result['total_results'] == 2
+    assert ids(result) == ['t5']
+    assert ids(index.search(category="food", start="2024-01-05", page=2, page_size=1)) == ['t2']
+    # Totals cover every match, not only the page
+    assert result['totals']['count'] == 2
+
+
+def test_page_size_zero_returns_only_totals(index):
+    result = index.search(query="payroll", page_size=0)
+    assert result['transactions'] == []
+    assert result['totals']['total_income'] == 2500.0
+
+
+def test_appended_transactions_are_searchable(index):
+    index.add([{"id": "t7", "date": "2024-04-01", "description": "Starbucks Reserve", "amount": -9.0,
+                "category": "food"}])
+    assert ids(index.search(query="reserve")) == ['t7']
+    assert ids(index.search(merchant="starbucks"))[0] == 't7'
+
+
+def test_edit_distance_counts_transpositions_once():
+    assert edit_distance("electric", "electirc", 2) == 1
+    assert edit_distance("cafe", "coffee", 1) == 2
+
+
+def test_search_endpoint_rejects_unsearchable_input(client):
+    assert client.get('/data/transactions/search?q=!!!').status_code == 400
+    assert client.get('/data/transactions/search?merchant=7-11').status_code == 400
+    assert client.get('/data/transactions/search').status_code == 400
+
+
+def test_merchant_question_without_a_name_goes_to_the_model(main_module):
+    query = "How much did I spend at 123 last month?"
+    assert main_module.intent_router.route(query).intent == 'merchant_spending'
+    assert main_module.answer_locally(query, main_module.financial_data) is None
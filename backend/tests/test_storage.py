@@ -0,0 +1,140 @@
+import json
+
+import pytest
+
+from rollup import RollupCube
+from storage import JsonStorage, SqliteStorage, summarize_rows
+
+TRANSACTIONS = [
+    {"id": "t1", "date": "2024-01-05", "description": "Salary", "amount": 3000.0, "category": "income",
+     "account": "checking", "type": "credit"},
+    {"id": "t2", "date": "2024-01-07", "description": "Grocery Store", "amount": -80.0, "category": "food",
+     "account": "checking", "type": "debit"},
+    {"id": "t3", "date": "2024-01-20", "description": "Gas Station", "amount": -45.5, "category": "transportation",
+     "account": "credit_card", "type": "debit"},
+    {"id": "t4", "date": "2024-02-02", "description": "Restaurant", "amount": -62.25, "category": "food",
+     "account": "credit_card", "type": "debit"},
+    {"id": "t5", "date": "2024-02-10", "description": "Electric Bill", "amount": -120.0, "category": "utilities",
+     "account": "checking", "type": "debit"},
+    {"id": "t6", "date": "2024-02-28", "description": "Cafe", "amount": -7.5, "category": "food",
+     "account": "checking", "type": "debit"},
+    {"id": "t7", "date": "2024-03-01", "description": "Salary", "amount": 3000.0, "category": "income",
+     "account": "checking", "type": "credit"},
+    {"id": "t8", "date": "pending", "description": "Bookstore", "amount": -30.0, "category": "shopping",
+     "account": "checking", "type": "debit"},
+]
+CREDIT_SCORE = {"current_score": 750, "score_range": "Good"}
+
+
+def rounded(value):
+    """Nested results with floats rounded, since SQLite and Python sum in different orders"""
+    if isinstance(value, dict):
+        return {k: rounded(v) for k, v in value.items()}
+    if isinstance(value, float):
+        return round(value, 6)
+    return value
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    directory = tmp_path / 'data'
+    directory.mkdir()
+    (directory / 'transactions.json').write_text(json.dumps({"transactions": TRANSACTIONS}))
+    (directory / 'credit_score.json').write_text(json.dumps(CREDIT_SCORE))
+    return directory
+
+
+def open_json(data_dir):
+    storage = JsonStorage(str(data_dir))
+    storage.documents = storage.load_all()
+    return storage
+
+
+def open_sqlite(data_dir, tmp_path):
+    storage = SqliteStorage(str(tmp_path / 'finance.sqlite3'))
+    storage.import_json(str(data_dir))
+    return storage
+
+
+@pytest.fixture
+def backends(data_dir, tmp_path):
+    return open_json(data_dir), open_sqlite(data_dir, tmp_path)
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"start": "2024-02-01"},
+    {"start": "2024-01-06", "end": "2024-02-10"},
+    {"category": "food"},
+    {"account": "credit_card"},
+    {"category": "food", "start": "2024-02-01"},
+])
+def test_spending_summary_matches(backends, filters):
+    json_storage, sqlite_storage = backends
+    assert rounded(sqlite_storage.spending_summary(**filters)) == rounded(json_storage.spending_summary(**filters))
+
+
+@pytest.mark.parametrize("columns", [None, ['id', 'amount']])
+def test_iter_transactions_matches(backends, columns):
+    json_storage, sqlite_storage = backends
+    filters = {"start": "2024-01-06", "category": "food", "columns": columns}
+    assert list(sqlite_storage.iter_transactions(**filters)) == list(json_storage.iter_transactions(**filters))
+
+
+def test_sqlite_rejects_unknown_columns(backends):
+    with pytest.raises(ValueError):
+        list(backends[1].iter_transactions(columns=['id', 'merchant']))
+
+
+def test_aggregations_match(backends):
+    json_storage, sqlite_storage = backends
+    assert sqlite_storage.transaction_count() == json_storage.transaction_count() == len(TRANSACTIONS)
+    assert sqlite_storage.expense_stats() == pytest.approx(json_storage.expense_stats())
+    assert sqlite_storage.expenses_above(50) == json_storage.expenses_above(50)
+    # Rows without a YYYY-MM-DD date stay out of the monthly totals
+    assert sqlite_storage.monthly_expenses() == json_storage.monthly_expenses() == {"2024-01": 125.5, "2024-02": 189.75}
+    assert list(sqlite_storage.monthly_expenses()) == list(json_storage.monthly_expenses())
+    assert rounded(sqlite_storage.category_stats()) == rounded(json_storage.category_stats())
+    assert sqlite_storage.income_month_count() == json_storage.income_month_count() == 2
+
+
+def test_documents_match(backends):
+    json_storage, sqlite_storage = backends
+    assert sqlite_storage.get_document('credit_score') == json_storage.get_document('credit_score') == CREDIT_SCORE
+    assert sqlite_storage.get_document('transactions') == json_storage.get_document('transactions')
+    assert sqlite_storage.get_document('epf') == json_storage.get_document('epf') == {}
+
+
+def test_rollup_summary_matches_storage(backends):
+    json_storage = backends[0]
+    summary = json_storage.spending_summary()
+    summary.pop('category_counts')
+    assert rounded(RollupCube(TRANSACTIONS).spending_summary()) == rounded(summary)
+    assert summarize_rows([])['transaction_count'] == 0
+
+
+APPENDED = [{"id": "t9", "date": "2024-03-05", "description": "Pharmacy", "amount": -19.0, "category": "health",
+             "account": "checking", "type": "debit"}]
+
+
+def test_json_append_keeps_the_data_files_unchanged(data_dir, tmp_path):
+    storage = open_json(data_dir)
+    before = (data_dir / 'transactions.json').read_text()
+    storage.documents['transactions']['transactions'].extend(APPENDED)
+    storage.append_transactions(APPENDED, storage.documents['transactions'])
+
+    assert (data_dir / 'transactions.json').read_text() == before
+    assert storage.spending_summary(category='health')['total_expenses'] == 19.0
+    # Appended rows are re-applied on a reload but are gone after a restart
+    assert storage.load_all()['transactions']['transactions'][-1] == APPENDED[0]
+    assert open_json(data_dir).transaction_count() == len(TRANSACTIONS)
+
+
+def test_sqlite_append_persists(data_dir, tmp_path):
+    storage = open_sqlite(data_dir, tmp_path)
+    storage.append_transactions(APPENDED)
+
+    reopened = SqliteStorage(str(tmp_path / 'finance.sqlite3'))
+    assert reopened.transaction_count() == len(TRANSACTIONS) + 1
+    assert reopened.load_all()['transactions']['transactions'][-1] == APPENDED[0]
+    assert reopened.spending_summary(category='health')['total_expenses'] == 19.0